@@ -0,0 +1,56 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import SimpleLazyObject
+from recipes.versions import get_version
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from .cache import get_cache
+
+TOKEN_CACHE_KEY = 'token:{}'
+UNCACHED_USER_FIELDS = ('password', 'confirmation_code')
+
+User = get_user_model()
+
+token_cache = SimpleLazyObject(
+    lambda: get_cache(settings.AUTH_TOKEN_CACHE)
+)
+
+
+def get_token_cache_key(key):
+    return TOKEN_CACHE_KEY.format(sha256(key.encode()).hexdigest())
+
+
+def dump_instance(instance, exclude=()):
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in exclude
+    }
+
+
+def load_instance(model, values):
+    return model.from_db(None, list(values), list(values.values()))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        version = get_version(cache_key)
+        cached = token_cache.get(cache_key)
+
+        if cached is None or cached[0] != version:
+            user, token = super().authenticate_credentials(key)
+            token_cache.set(cache_key, (
+                version,
+                dump_instance(token),
+                dump_instance(user, UNCACHED_USER_FIELDS),
+            ))
+            return user, token
+
+        _, token_values, user_values = cached
+        token = load_instance(Token, token_values)
+        token.user = load_instance(User, user_values)
+        return token.user, token
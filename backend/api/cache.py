@@ -0,0 +1,89 @@
+import time
+from collections import OrderedDict
+from hashlib import md5
+from threading import Lock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+from recipes.versions import get_version
+
+
+class LRUCache:
+    def __init__(self, max_entries=1000, timeout=300):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoCache:
+    def __init__(self, alias='default', timeout=300, **kwargs):
+        self.cache = caches[alias]
+        self.timeout = timeout
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def delete(self, key):
+        self.cache.delete(key)
+
+    def clear(self):
+        self.cache.clear()
+
+
+def get_cache(config):
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+def get_response_cache():
+    return get_cache(settings.RESPONSE_CACHE)
+
+
+response_cache = SimpleLazyObject(get_response_cache)
+
+
+def get_response_cache_key(request, version_name='recipes'):
+    if not request.user.is_anonymous:
+        return None
+
+    query = sorted(
+        (key, value) for key, values in request.query_params.lists()
+        for value in values
+    )
+    source = (
+        f'{get_version(version_name)}:{request.build_absolute_uri("?")}'
+        f':{query}'
+    )
+    return f'response:{md5(source.encode()).hexdigest()}'
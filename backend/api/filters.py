@@ -1,16 +1,18 @@
 from django_filters import rest_framework as filters
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
+from recipes.search import get_search_backend
 
+from .utils import match_ingredients, subscribed_recipes
 
-class IngredientFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='istartswith'
-    )
+MATCH_CHOICES = (
+    ('all', 'all'),
+    ('any', 'any'),
+    ('best', 'best'),
+)
 
-    class Meta:
-        model = Ingredient
-        fields = ('name',)
+
+class NumberInFilter(filters.BaseInFilter, filters.NumberFilter):
+    pass
 
 
 class RecipeFilter(filters.FilterSet):
@@ -28,6 +30,19 @@ class RecipeFilter(filters.FilterSet):
     is_subscribed = filters.BooleanFilter(
         method='filter_is_subscribed'
     )
+    search = filters.CharFilter(
+        method='filter_search'
+    )
+    ingredients = NumberInFilter(
+        method='filter_ingredients'
+    )
+    exclude_ingredients = NumberInFilter(
+        method='filter_ingredients'
+    )
+    match = filters.ChoiceFilter(
+        choices=MATCH_CHOICES,
+        method='filter_ingredients'
+    )
 
     class Meta:
         model = Recipe
@@ -51,4 +66,24 @@ class RecipeFilter(filters.FilterSet):
 
     def filter_is_subscribed(self, queryset, name, value):
         user = self.request.user
-        return queryset.filter(author=user)
+
+        if user.is_anonymous:
+            return queryset.none()
+
+        return subscribed_recipes(queryset, user)
+
+    def filter_search(self, queryset, name, value):
+        return get_search_backend().search(queryset, value)
+
+    def filter_ingredients(self, queryset, name, value):
+        data = self.form.cleaned_data
+        include = data.get('ingredients')
+        if name == 'match' or (name == 'exclude_ingredients' and include):
+            return queryset
+
+        return match_ingredients(
+            queryset,
+            include=map(int, include or ()),
+            exclude=map(int, data.get('exclude_ingredients') or ()),
+            mode=data.get('match') or 'all',
+        )
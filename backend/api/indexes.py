@@ -0,0 +1,59 @@
+from bisect import bisect_left
+from threading import Lock
+
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+PREFIX_END = '\U0010ffff'
+
+
+class IngredientIndex:
+    def __init__(self):
+        self._lock = Lock()
+        self._version = None
+        self._index = ([], [])
+
+    def _load(self):
+        version = get_version('ingredients')
+        if version == self._version:
+            return
+
+        with self._lock:
+            if version == self._version:
+                return
+            rows = sorted(
+                (name.casefold(), id, name, unit)
+                for id, name, unit in Ingredient.objects.values_list(
+                    'id', 'name', 'measurement_unit'
+                )
+            )
+            self._index = (
+                [key for key, *_ in rows],
+                [
+                    {'id': id, 'name': name, 'measurement_unit': unit}
+                    for _, id, name, unit in rows
+                ],
+            )
+            self._version = version
+
+    def search(self, name=''):
+        self._load()
+        keys, items = self._index
+        prefix = name.casefold()
+
+        if not prefix:
+            return items
+
+        start = bisect_left(keys, prefix)
+        end = bisect_left(keys, prefix + PREFIX_END, start)
+        if start < end:
+            return items[start:end]
+
+        matches = sorted(
+            (key.find(prefix), len(key), num)
+            for num, key in enumerate(keys) if prefix in key
+        )
+        return [items[num] for *_, num in matches]
+
+
+ingredient_index = IngredientIndex()
@@ -0,0 +1,347 @@
+import base64
+import json
+import math
+import random
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from api.middleware import QueryBudgetExceededError, QueryCounter
+from api.renderers import FastJSONRenderer
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from PIL import Image
+from recipes.images import executor
+from recipes.models import Ingredient, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from users.models import User
+
+PAGE_SIZES = (1, 6, 50)
+SEARCH_PREFIXES = ('м', 'мо', 'ка', 'со', 'пе')
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[max(0, math.ceil(len(values) * percent / 100) - 1)]
+
+
+def make_image():
+    buffer = BytesIO()
+    Image.new('RGB', (64, 64), (200, 120, 40)).save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+def seed(options):
+    call_command(
+        'seed_data', users=options['users'], recipes=options['recipes'],
+        ingredients=options['ingredients'], seed=options['seed'],
+        stdout=StringIO()
+    )
+    return User.objects.order_by('-recipes_count', 'id').first()
+
+
+class Scenarios:
+    def __init__(self, user, rng):
+        self.rng = rng
+        self.client = Client(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+        )
+        self.anonymous = Client()
+        self.image = make_image()
+        self.tags = list(Tag.objects.values_list('id', 'slug'))
+        self.ingredients = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+        self.recipes = list(Recipe.objects.exclude(
+            favorite_recipe__user=user
+        ).exclude(
+            shopping_recipe__user=user
+        ).values_list('id', flat=True))
+        self.own_recipes = list(
+            Recipe.objects.filter(author=user).values_list('id', flat=True)
+        )
+        self.user = user
+
+    def recipe_data(self, name):
+        return {
+            'ingredients': [
+                {'id': id, 'amount': self.rng.randint(1, 500)}
+                for id in self.rng.sample(self.ingredients, 8)
+            ],
+            'tags': [self.rng.choice(self.tags)[0]],
+            'image': self.image,
+            'name': name,
+            'text': 'Описание',
+            'cooking_time': self.rng.randint(1, 120),
+        }
+
+    def toggle(self, url, i):
+        recipe = self.recipes[(i // 2) % len(self.recipes)]
+        if i % 2:
+            return self.client, 'DELETE', url.format(recipe), None, 204
+        return self.client, 'POST', url.format(recipe), None, 200
+
+    def read_paths(self):
+        return {
+            'recipes_list': '/api/recipes/?limit=50',
+            'recipe_detail': f'/api/recipes/{self.recipes[0]}/',
+            'tags_list': '/api/tags/',
+            'ingredient_detail': f'/api/ingredients/{self.ingredients[0]}/',
+        }
+
+    def all(self):
+        return {
+            'recipes_list': lambda i: (
+                self.client, 'GET',
+                f'/api/recipes/?limit={PAGE_SIZES[i % 3]}&page={i % 5 + 1}',
+                None, 200
+            ),
+            'recipes_list_anonymous': lambda i: (
+                self.anonymous, 'GET',
+                f'/api/recipes/?limit={PAGE_SIZES[i % 3]}&page={i % 5 + 1}',
+                None, 200
+            ),
+            'recipes_list_filtered': lambda i: (
+                self.client, 'GET',
+                f'/api/recipes/?tags={self.rng.choice(self.tags)[1]}'
+                f'&ingredients={self.rng.choice(self.ingredients)}'
+                f'&match=any&is_favorited={i % 2}&limit=6',
+                None, 200
+            ),
+            'recipe_detail': lambda i: (
+                self.client, 'GET',
+                f'/api/recipes/{self.rng.choice(self.recipes)}/', None, 200
+            ),
+            'recipe_create': lambda i: (
+                self.client, 'POST', '/api/recipes/',
+                self.recipe_data(f'Новый рецепт {i}'), 201
+            ),
+            'recipe_update': lambda i: (
+                self.client, 'PATCH',
+                f'/api/recipes/{self.rng.choice(self.own_recipes)}/',
+                self.recipe_data(f'Изменённый рецепт {i}'), 200
+            ),
+            'favorite_toggle': lambda i: self.toggle(
+                '/api/recipes/{}/favorite/', i
+            ),
+            'shopping_cart_toggle': lambda i: self.toggle(
+                '/api/recipes/{}/shopping_cart/', i
+            ),
+            'subscriptions': lambda i: (
+                self.client, 'GET',
+                f'/api/users/subscriptions/?recipes_limit={i % 3 + 1}',
+                None, 200
+            ),
+            'ingredient_autocomplete': lambda i: (
+                self.client, 'GET',
+                f'/api/ingredients/?name={self.rng.choice(SEARCH_PREFIXES)}',
+                None, 200
+            ),
+            'download_shopping_cart': lambda i: (
+                self.client, 'GET',
+                '/api/recipes/download_shopping_cart/?format='
+                + ('txt', 'csv', 'json')[i % 3],
+                None, 200
+            ),
+        }
+
+
+def send(client, method, path, data):
+    counter = QueryCounter()
+    start = time.perf_counter()
+
+    with connection.execute_wrapper(counter):
+        response = client.generic(
+            method, path, json.dumps(data) if data else '',
+            content_type='application/json'
+        )
+        if response.streaming:
+            b''.join(response.streaming_content)
+
+    return response, time.perf_counter() - start, counter.count
+
+
+def run_scenario(build, iterations, warmup):
+    latencies, queries = [], []
+
+    for i in range(warmup + iterations):
+        client, method, path, data, expected = build(i)
+        response, elapsed, count = send(client, method, path, data)
+        if response.status_code != expected:
+            raise CommandError(
+                f'{method} {path}: ответ {response.status_code}, '
+                f'ожидался {expected}'
+            )
+        if i >= warmup:
+            latencies.append(elapsed * 1000)
+            queries.append(count)
+
+    return {
+        'requests': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(sum(latencies) / iterations, 3),
+        'rps': round(iterations * 1000 / sum(latencies), 1),
+        'queries_max': max(queries),
+        'queries_mean': round(sum(queries) / iterations, 2),
+    }
+
+
+def time_render(renderer, data, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        body = renderer.render(data)
+    return body, (time.perf_counter() - start) * 1000 / iterations
+
+
+def compare_serialization(client, paths, iterations, warmup):
+    report, payloads = {}, []
+
+    for name, path in paths.items():
+        stats, bodies = {}, {}
+        for fast in (False, True):
+            with override_settings(FAST_SERIALIZATION=fast):
+                stats[fast] = run_scenario(
+                    lambda i: (client, 'GET', path, None, 200),
+                    iterations, warmup
+                )['p50_ms']
+                bodies[fast] = send(client, 'GET', path, None)[0].content
+        if bodies[False] != bodies[True]:
+            raise CommandError(
+                f'{path}: ответ быстрого пути отличается от сериализатора'
+            )
+        payloads.append(bodies[True])
+        report[name] = {
+            'serializer_p50_ms': stats[False],
+            'fast_p50_ms': stats[True],
+            'speedup': round(stats[False] / stats[True], 2),
+        }
+
+    data = json.loads(max(payloads, key=len))
+    body, json_ms = time_render(JSONRenderer(), data, iterations)
+    fast_body, fast_ms = time_render(FastJSONRenderer(), data, iterations)
+    if body != fast_body:
+        raise CommandError('FastJSONRenderer отличается от JSONRenderer')
+    report['render'] = {
+        'json_ms': round(json_ms, 3),
+        'fast_ms': round(fast_ms, 3),
+        'speedup': round(json_ms / fast_ms, 2),
+    }
+
+    return report
+
+
+def compare(report, baseline, tolerance):
+    regressions = []
+
+    for name, stats in report['scenarios'].items():
+        base = baseline.get('scenarios', {}).get(name)
+        if base is None:
+            continue
+        if stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            regressions.append(
+                f'{name}: p95 {stats["p95_ms"]} мс, '
+                f'в базовом замере {base["p95_ms"]} мс'
+            )
+        if stats['queries_max'] > base['queries_max']:
+            regressions.append(
+                f'{name}: {stats["queries_max"]} запросов к БД, '
+                f'в базовом замере {base["queries_max"]}'
+            )
+
+    return regressions
+
+
+class Command(BaseCommand):
+    help = 'Нагрузочный замер API на тестовой базе с синтетическими данными'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--recipes', type=int, default=2000)
+        parser.add_argument('--ingredients', type=int, default=300)
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--scenario', action='append',
+            help='Запустить только указанные сценарии'
+        )
+        parser.add_argument('--output', help='Файл для JSON-отчёта')
+        parser.add_argument('--baseline', help='JSON-отчёт для сравнения')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Допустимый рост p95 относительно базового замера'
+        )
+        parser.add_argument(
+            '--keepdb', action='store_true',
+            help='Не удалять тестовую базу после замера'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, keepdb=options['keepdb']
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media, override_settings(
+                MEDIA_ROOT=media, QUERY_BUDGET_STRICT=True
+            ):
+                report = self.benchmark(options)
+                executor.shutdown(wait=True)
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=0, keepdb=options['keepdb']
+            )
+            teardown_test_environment()
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+            regressions = compare(report, baseline, options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Регрессия производительности:\n' + '\n'.join(regressions)
+                )
+
+    def benchmark(self, options):
+        rng = random.Random(options['seed'])
+        user = seed(options)
+        benchmark = Scenarios(user, rng)
+        scenarios = benchmark.all()
+        selected = options['scenario'] or list(scenarios)
+        unknown = set(selected) - set(scenarios)
+        if unknown:
+            raise CommandError(f'Неизвестные сценарии: {", ".join(unknown)}')
+
+        report = {'dataset': {
+            key: options[key]
+            for key in ('users', 'recipes', 'ingredients', 'seed')
+        }, 'scenarios': {}}
+        for name in selected:
+            try:
+                report['scenarios'][name] = run_scenario(
+                    scenarios[name], options['iterations'], options['warmup']
+                )
+            except QueryBudgetExceededError as error:
+                raise CommandError(f'{name}: {error}')
+
+        report['serialization'] = compare_serialization(
+            benchmark.client, benchmark.read_paths(),
+            options['iterations'], options['warmup']
+        )
+        return report
@@ -0,0 +1,102 @@
+import json
+import logging
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.queries')
+
+
+class QueryBudgetExceededError(Exception):
+    pass
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.slowest = (0.0, '')
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.duration += duration
+            if duration >= self.slowest[0]:
+                self.slowest = (duration, sql)
+
+
+def get_query_budget(request, view_func):
+    budgets = getattr(getattr(view_func, 'cls', None), 'query_budgets', {})
+    actions = getattr(view_func, 'actions', None) or {}
+    return budgets.get(actions.get(request.method.lower()))
+
+
+@contextmanager
+def counting(counter):
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(counter))
+        yield
+
+
+class QueryCountMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        request.query_budget = None
+
+        with counting(counter):
+            response = self.get_response(request)
+
+        if response.streaming:
+            response.streaming_content = self.stream(
+                request, response, counter, response.streaming_content
+            )
+        else:
+            self.report(request, response, counter)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.query_budget = get_query_budget(request, view_func)
+
+    def stream(self, request, response, counter, content):
+        with counting(counter):
+            yield from content
+        self.report(request, response, counter)
+
+    def report(self, request, response, counter):
+        budget = request.query_budget
+        exceeded = budget is not None and counter.count > budget
+        level = logging.WARNING if exceeded else logging.INFO
+        if logger.isEnabledFor(level):
+            logger.log(level, json.dumps({
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': counter.count,
+                'budget': budget,
+                'db_ms': round(counter.duration * 1000, 2),
+                'slowest_ms': round(counter.slowest[0] * 1000, 2),
+                'slowest_sql': counter.slowest[1][:500],
+            }, ensure_ascii=False))
+
+        if settings.QUERY_COUNT_HEADERS:
+            response['X-DB-Queries'] = counter.count
+            response['X-DB-Time'] = f'{counter.duration * 1000:.2f}'
+            response['X-DB-Slowest-Time'] = f'{counter.slowest[0] * 1000:.2f}'
+            if budget is not None:
+                response['X-DB-Query-Budget'] = budget
+
+        if exceeded and settings.QUERY_BUDGET_STRICT:
+            raise QueryBudgetExceededError(
+                f'{request.method} {request.path}: {counter.count} '
+                f'запросов при бюджете {budget}'
+            )
@@ -0,0 +1,79 @@
+from functools import partial
+from hashlib import md5
+
+from django.conf import settings
+from django.utils.cache import (get_conditional_response, patch_vary_headers,
+                                quote_etag)
+from django.utils.http import http_date
+from recipes.versions import get_version
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+
+def conditional_response(request, etag, get_response, last_modified=None):
+    etag = quote_etag(md5(etag.encode()).hexdigest())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = get_response()
+
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_vary_headers(response, ('Authorization',))
+    return response
+
+
+class VersionETagMixin:
+    version_name = None
+
+    def get_conditional_response(self, request, get_response):
+        version = get_version(self.version_name)
+        return conditional_response(
+            request,
+            f'{self.version_name}:{version}:{request.get_full_path()}',
+            get_response,
+            last_modified=int(version),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
+
+
+class ValuesReadMixin:
+    read_plan = None
+
+    def get_values_queryset(self):
+        return self.read_plan.values(self.filter_queryset(self.get_queryset()))
+
+    def serialize_values(self, rows):
+        return self.read_plan.build_all(rows)
+
+    def list(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.get_values_queryset()
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.serialize_values(page))
+        return Response(self.serialize_values(rows))
+
+    def retrieve(self, request, *args, **kwargs):
+        if not settings.FAST_SERIALIZATION:
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            self.get_values_queryset(),
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return Response(self.serialize_values([row])[0])
@@ -0,0 +1,76 @@
+from django.db import connections
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+def estimate_count(queryset):
+    queryset = queryset.order_by()
+    connection = connections[queryset.db]
+
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        return int(cursor.fetchone()[0][0]['Plan']['Plan Rows'])
+
+
+class RecipeCursorPagination(CursorPagination):
+    ordering = ('-pub_date', 'id')
+    page_size_query_param = 'limit'
+    max_page_size = 100
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if queryset.query.order_by:
+            raise ValidationError({
+                'ordering': 'Сортировка по релевантности (search, '
+                            'match=best) недоступна при курсорной '
+                            'пагинации.'
+            })
+
+        count = request.query_params.get('count')
+        if count == 'exact':
+            self.count = queryset.order_by().count()
+        elif count == 'estimate':
+            self.count = estimate_count(queryset)
+        else:
+            self.count = None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        response = super().get_paginated_response(data)
+        if self.count is not None:
+            response.data['count'] = self.count
+        return response
+
+
+class RecipePagination(PageNumberPagination):
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+
+        if (
+            request.query_params.get('pagination') == 'cursor'
+            or self.cursor_pagination_class.cursor_query_param
+            in request.query_params
+        ):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view
+            )
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def to_html(self):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.to_html()
+        return super().to_html()
@@ -0,0 +1,100 @@
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from recipes.images import image_variant_urls
+from recipes.models import IngredientRecipe, Recipe
+
+from .utils import annotate_is_subscribed
+
+User = get_user_model()
+
+
+class FieldPlan:
+    def __init__(self, **fields):
+        self.keys = tuple(fields)
+        self.columns = tuple(fields.values())
+
+    def values(self, queryset, *extra):
+        return queryset.values_list(*extra, *self.columns)
+
+    def build_all(self, rows):
+        return [dict(zip(self.keys, values)) for values in rows]
+
+    def group(self, queryset, key):
+        groups = defaultdict(list)
+        for group, *values in self.values(queryset, key):
+            groups[group].append(dict(zip(self.keys, values)))
+        return groups
+
+
+TAG_PLAN = FieldPlan(id='id', name='name', color='color', slug='slug')
+INGREDIENT_PLAN = FieldPlan(
+    id='id', name='name', measurement_unit='measurement_unit'
+)
+AUTHOR_PLAN = FieldPlan(
+    email='email', id='id', username='username', first_name='first_name',
+    last_name='last_name', is_subscribed='is_subscribed',
+)
+RECIPE_TAG_PLAN = FieldPlan(
+    id='tag__id', name='tag__name', color='tag__color', slug='tag__slug'
+)
+RECIPE_INGREDIENT_PLAN = FieldPlan(
+    id='ingredient__id', name='ingredient__name',
+    measurement_unit='ingredient__measurement_unit', amount='amount',
+)
+RECIPE_COLUMNS = (
+    'id', 'author_id', 'name', 'image', 'image_variants', 'text',
+    'cooking_time', 'pub_date', 'is_favorited', 'is_in_shopping_cart',
+)
+
+
+def recipe_values(queryset):
+    return queryset.prefetch_related(None).values(*RECIPE_COLUMNS)
+
+
+def serialize_recipes(rows, request):
+    if not rows:
+        return []
+
+    ids = [row['id'] for row in rows]
+    tags = RECIPE_TAG_PLAN.group(
+        Recipe.tags.through.objects.filter(
+            recipe_id__in=ids
+        ).order_by('tag__name'),
+        'recipe_id'
+    )
+    ingredients = RECIPE_INGREDIENT_PLAN.group(
+        IngredientRecipe.objects.filter(
+            recipe_id__in=ids
+        ).order_by('ingredient__name'),
+        'recipe_id'
+    )
+    authors = {
+        author['id']: author
+        for author in AUTHOR_PLAN.build_all(AUTHOR_PLAN.values(
+            annotate_is_subscribed(
+                User.objects.filter(id__in={row['author_id'] for row in rows}),
+                request.user
+            )
+        ))
+    }
+    url = Recipe._meta.get_field('image').storage.url
+    absolute = request.build_absolute_uri
+
+    return [
+        {
+            'id': row['id'],
+            'tags': tags[row['id']],
+            'author': authors[row['author_id']],
+            'ingredients': ingredients[row['id']],
+            'is_favorited': row['is_favorited'],
+            'is_in_shopping_cart': row['is_in_shopping_cart'],
+            'name': row['name'],
+            'image': absolute(url(row['image'])) if row['image'] else None,
+            'image_variants': image_variant_urls(
+                row['image_variants'], absolute
+            ),
+            'text': row['text'],
+            'cooking_time': row['cooking_time'],
+        } for row in rows
+    ]
@@ -0,0 +1,84 @@
+import csv
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+class FastJSONRenderer(JSONRenderer):
+    def use_orjson(self, data, accepted_media_type, renderer_context):
+        return (
+            orjson is not None and data is not None
+            and not self.ensure_ascii and self.compact
+            and self.get_indent(
+                accepted_media_type, renderer_context or {}
+            ) is None
+        )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if self.use_orjson(data, accepted_media_type, renderer_context):
+            try:
+                ret = orjson.dumps(
+                    data, default=self.encoder_class().default,
+                    option=orjson.OPT_PASSTHROUGH_DATETIME,
+                )
+            except orjson.JSONEncodeError:
+                pass
+            else:
+                return ret.replace(
+                    b'\xe2\x80\xa8', b'\\u2028'
+                ).replace(b'\xe2\x80\xa9', b'\\u2029')
+
+        return super().render(data, accepted_media_type, renderer_context)
+
+
+class PlainTextRenderer(BaseRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = '\n'.join(f'{key}: {value}' for key, value in data.items())
+        return str(data).encode(self.charset)
+
+
+class ShoppingListTextRenderer(PlainTextRenderer):
+    def stream(self, rows, user):
+        yield f'Список покупок пользователя {user}:\n'
+        for num, (name, unit, amount) in enumerate(rows, start=1):
+            yield f'{num}. {name} ({unit}) - {amount}\n'
+
+
+class ShoppingListCSVRenderer(PlainTextRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows, user):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            yield writer.writerow(row)
+
+
+class ShoppingListJSONRenderer(JSONRenderer):
+    def stream(self, rows, user):
+        separator = '['
+        for name, unit, amount in rows:
+            yield separator + json.dumps(
+                {'name': name, 'measurement_unit': unit, 'amount': amount},
+                ensure_ascii=False
+            )
+            separator = ','
+        yield ']' if separator == ',' else '[]'
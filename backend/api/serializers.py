@@ -1,12 +1,17 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from djoser.serializers import UserSerializer
 from drf_extra_fields.fields import Base64ImageField
+from recipes.images import image_variant_urls
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Subscription, Tag)
+                            ShoppingCart, ShoppingCartIngredient, Subscription,
+                            Tag)
 from rest_framework import serializers
 
-from .utils import create_update_recipe, get_bool
+from .utils import (create_update_recipe, get_bool, get_recipes_limit,
+                    recipe_ingredients_prefetch, validate_ids)
 
 User = get_user_model()
 
@@ -27,7 +32,7 @@ class CustomUserSerializer(UserSerializer):
         )
 
     def get_is_subscribed(self, obj):
-        return get_bool(self, Subscription, obj)
+        return get_bool(self, Subscription, obj, 'is_subscribed')
 
 
 class IngredientSerializer(serializers.ModelSerializer):
@@ -48,16 +53,47 @@ class TagSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class RecipeImageField(Base64ImageField):
+    def to_internal_value(self, base64_data):
+        if (
+            isinstance(base64_data, str)
+            and len(base64_data) > settings.IMAGE_MAX_UPLOAD_SIZE * 4 // 3
+        ):
+            raise serializers.ValidationError(
+                'Размер изображения не должен превышать '
+                f'{settings.IMAGE_MAX_UPLOAD_SIZE // 1024} КБ.'
+            )
+
+        image = super().to_internal_value(base64_data)
+        if image is None:
+            return image
+        width, height = image.image.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                f'Изображение {width}x{height} слишком большое.'
+            )
+        return image
+
+
 class RecipeMiniSerializer(serializers.ModelSerializer):
-    image = Base64ImageField(
+    image = RecipeImageField(
         required=False, allow_null=True, use_url=True
     )
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
         read_only_fields = ('name', 'image', 'cooking_time')
 
+    def get_image_variants(self, obj):
+        request = self.context.get('request')
+        return image_variant_urls(
+            obj['image_variants'] if isinstance(obj, dict)
+            else obj.image_variants,
+            request and request.build_absolute_uri
+        )
+
 
 class RecipeSerializer(RecipeMiniSerializer):
     tags = TagSerializer(many=True, read_only=True)
@@ -70,19 +106,25 @@ class RecipeSerializer(RecipeMiniSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart',
-                  'name', 'image', 'text', 'cooking_time')
+                  'name', 'image', 'image_variants', 'text',
+                  'cooking_time')
 
     def get_ingredients(self, obj):
-        return obj.ingredients.values(
-            'id', 'name', 'measurement_unit',
-            amount=models.F('ingredient_recipe__amount')
-        )
+        prefetch_related_objects([obj], recipe_ingredients_prefetch())
+        return [
+            {
+                'id': item.ingredient.id,
+                'name': item.ingredient.name,
+                'measurement_unit': item.ingredient.measurement_unit,
+                'amount': item.amount,
+            } for item in obj.recipe_ingredient.all()
+        ]
 
     def get_is_favorited(self, obj):
-        return get_bool(self, Favorite, obj)
+        return get_bool(self, Favorite, obj, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return get_bool(self, ShoppingCart, obj)
+        return get_bool(self, ShoppingCart, obj, 'is_in_shopping_cart')
 
     def validate(self, data):
         ingredients = self.initial_data.get('ingredients')
@@ -95,13 +137,15 @@ class RecipeSerializer(RecipeMiniSerializer):
                 'Выберите ингридиенты.'
             )
 
-        ingredients_id = []
+        validate_ids(
+            Ingredient,
+            [ingredient.get('id') for ingredient in ingredients],
+            'Ингредиента с id: {}, нет.'
+        )
+
+        ingredients_id = set()
         for ingredient in ingredients:
-            id = ingredient.get('id')
-            if not Ingredient.objects.filter(id=id).exists():
-                raise serializers.ValidationError(
-                    f'Ингредиента с id: {id}, нет.'
-                )
+            id = int(ingredient.get('id'))
             if id in ingredients_id:
                 raise serializers.ValidationError(
                     f'{ingredient} уже добавлен.'
@@ -110,18 +154,14 @@ class RecipeSerializer(RecipeMiniSerializer):
                 raise serializers.ValidationError(
                     'Введите количество ингредиента.'
                 )
-            ingredients_id.append(id)
+            ingredients_id.add(id)
 
         if len(tags) == 0:
             raise serializers.ValidationError(
                 'Выберите Теги.'
             )
 
-        for tag in tags:
-            if not Tag.objects.filter(id=tag).exists():
-                raise serializers.ValidationError(
-                    f'Тега с id: {tag}, нет.'
-                )
+        tags = validate_ids(Tag, tags, 'Тега с id: {}, нет.')
 
         data.update({
             'ingredients': ingredients,
@@ -142,27 +182,29 @@ class RecipeSerializer(RecipeMiniSerializer):
             raise serializers.ValidationError(
                 f'Рецепт с названием {name} уже добавлен.'
             )
-        return create_update_recipe(validated_data, author=author)
+        with transaction.atomic():
+            return create_update_recipe(validated_data, author=author)
 
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
+        if validated_data.get('image') is not None:
+            instance.image = validated_data['image']
+            instance.image_variants = {}
         instance.name = validated_data.get('name', instance.name)
         instance.text = validated_data.get('text', instance.text)
         instance.cooking_time = validated_data.get(
             'cooking_time', instance.cooking_time
         )
-        ingredients = IngredientRecipe.objects.filter(
-            recipe_id=instance.id
-        )
-        ingredients.delete()
-        create_update_recipe(validated_data, instance=instance)
-        instance.save()
+        with transaction.atomic():
+            instance.save(update_fields=(
+                'image', 'image_variants', 'name', 'text', 'cooking_time',
+                'updated_at'
+            ))
+            create_update_recipe(validated_data, instance=instance)
         return instance
 
 
 class SubscribeSerializer(CustomUserSerializer):
-    recipes = RecipeMiniSerializer(many=True, read_only=True)
-    recipes_count = serializers.SerializerMethodField()
+    recipes = serializers.SerializerMethodField()
 
     class Meta(CustomUserSerializer.Meta):
         fields = ('email', 'id', 'username', 'first_name',
@@ -177,16 +219,20 @@ class SubscribeSerializer(CustomUserSerializer):
             raise serializers.ValidationError(
                 'Подпишитесь на кого нибудь другого'
             )
-        if Subscription.objects.filter(
-            user=user, author=author
-        ).exists():
-            raise serializers.ValidationError(
-                f'Вы уже подписаны на пользователя: {author}.'
-            )
         return data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
+    def get_recipes(self, obj):
+        recipes = getattr(obj, 'limited_recipes', None)
+
+        if recipes is None:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
+
+        return RecipeMiniSerializer(
+            recipes, many=True, context=self.context
+        ).data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
@@ -199,3 +245,15 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     class Meta:
         model = ShoppingCart
         fields = '__all__'
+
+
+class ShoppingCartIngredientSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = ShoppingCartIngredient
+        fields = ('id', 'name', 'measurement_unit', 'amount')
@@ -0,0 +1,102 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription, Tag)
+from recipes.search import get_search_backend
+from recipes.versions import bump_version
+from rest_framework.authtoken.models import Token
+from users.models import User
+
+from .authentication import get_token_cache_key
+from .utils import change_counter, fan_out_recipe, relation_changed
+
+AUTHOR_FIELDS = frozenset(('email', 'username', 'first_name', 'last_name'))
+
+
+def bump_on_commit(*names):
+    for name in names:
+        transaction.on_commit(partial(bump_version, name))
+
+
+def relation_target(instance):
+    if isinstance(instance, Subscription):
+        return instance.author_id
+    return instance.recipe_id
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredient_changed(sender, **kwargs):
+    bump_on_commit('ingredients', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tag_changed(sender, **kwargs):
+    bump_on_commit('tags', 'recipes')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_changed(sender, **kwargs):
+    bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, created, update_fields=None, **kwargs):
+    if not created and (
+        update_fields is None or AUTHOR_FIELDS.intersection(update_fields)
+    ):
+        bump_on_commit('recipes')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields != frozenset(('last_login',)):
+        bump_on_commit(*map(get_token_cache_key, Token.objects.filter(
+            user=instance
+        ).values_list('key', flat=True)))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    bump_on_commit(get_token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+def relation_created(sender, instance, created, **kwargs):
+    if created:
+        relation_changed(
+            sender, instance.user_id, [relation_target(instance)], 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(pre_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def relation_deleted(sender, instance, **kwargs):
+    relation_changed(
+        sender, instance.user_id, [relation_target(instance)], -1
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            User.objects.filter(pk=instance.author_id), 'recipes_count', 1
+        )
+        fan_out_recipe(instance)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, instance, **kwargs):
+    change_counter(
+        User.objects.filter(pk=instance.author_id), 'recipes_count', -1
+    )
+    get_search_backend().remove([instance.id])
@@ -1,10 +1,34 @@
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import (BooleanField, Count, Exists, F, IntegerField,
+                              OuterRef, Prefetch, Q, Subquery, Value)
+from django.db.models.functions import Coalesce
+from django.http import Http404
 from django.shortcuts import get_object_or_404
-from recipes.models import Ingredient, IngredientRecipe, Recipe, Subscription
+from recipes.images import schedule_image_variants
+from recipes.models import (Favorite, FeedItem, IngredientRecipe, Recipe,
+                            ShoppingCart, Subscription)
+from recipes.search import get_search_backend
+from recipes.shopping import (amount_changes, change_recipe_shopping_totals,
+                              change_shopping_totals)
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 
+User = get_user_model()
+
+FEED_STRATEGIES = ('read', 'write')
+BULK_LIMIT = 100
+
+
+def get_bool(self, model, obj, field=None):
+    annotated = getattr(obj, field, None) if field else None
+    if annotated is not None:
+        return annotated
 
-def get_bool(self, model, obj):
     user = self.context.get('request').user
 
     if user.is_anonymous:
@@ -26,69 +50,429 @@ def get_bool(self, model, obj):
     return False
 
 
+def annotate_is_subscribed(queryset, user):
+    if user.is_anonymous:
+        return queryset.annotate(
+            is_subscribed=Value(False, output_field=BooleanField())
+        )
+
+    return queryset.annotate(
+        is_subscribed=Exists(Subscription.objects.filter(
+            author=OuterRef('pk'), user=user
+        ))
+    )
+
+
+def recipe_ingredients_prefetch():
+    return Prefetch(
+        'recipe_ingredient',
+        queryset=IngredientRecipe.objects.select_related(
+            'ingredient'
+        ).order_by('ingredient__name')
+    )
+
+
+def recipe_flags(user):
+    if user.is_anonymous:
+        return {
+            'is_favorited': Value(False, output_field=BooleanField()),
+            'is_in_shopping_cart': Value(False, output_field=BooleanField()),
+        }
+
+    return {
+        'is_favorited': Exists(Favorite.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        )),
+        'is_in_shopping_cart': Exists(ShoppingCart.objects.filter(
+            recipe=OuterRef('pk'), user=user
+        )),
+    }
+
+
+def annotate_recipe_flags(queryset, user):
+    authors = annotate_is_subscribed(User.objects.all(), user)
+    return queryset.prefetch_related(
+        Prefetch('author', queryset=authors)
+    ).annotate(**recipe_flags(user))
+
+
+def get_recipes_limit(request):
+    recipes_limit = request.query_params.get('recipes_limit')
+
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+
+    return None
+
+
+def annotate_subscriptions(queryset, user, recipes_limit=None):
+    recipes = Recipe.objects.all()
+
+    if recipes_limit is not None:
+        recipes = recipes.filter(id__in=Subquery(
+            Recipe.objects.filter(
+                author=OuterRef('author')
+            ).values('id')[:recipes_limit]
+        ))
+
+    return annotate_is_subscribed(queryset, user).prefetch_related(
+        Prefetch('recipes', queryset=recipes, to_attr='limited_recipes')
+    )
+
+
+def subscribed_recipes(queryset, user):
+    return queryset.filter(
+        author__in=Subscription.objects.filter(user=user).values('author')
+    )
+
+
+def count_recipe_ingredients(rows):
+    return Coalesce(Subquery(
+        rows.order_by().values('recipe').annotate(
+            total=Count('id')
+        ).values('total'),
+        output_field=IntegerField()
+    ), 0)
+
+
+def match_ingredients(queryset, include=(), exclude=(), mode='all'):
+    include, exclude = set(include), set(exclude)
+    rows = IngredientRecipe.objects.filter(recipe=OuterRef('pk'))
+
+    if exclude:
+        queryset = queryset.exclude(
+            Exists(rows.filter(ingredient__in=exclude))
+        )
+    if not include:
+        return queryset
+
+    if mode == 'all':
+        return queryset.filter(id__in=IngredientRecipe.objects.filter(
+            ingredient__in=include
+        ).order_by().values('recipe').annotate(
+            matched=Count('ingredient', distinct=True)
+        ).filter(matched=len(include)).values('recipe'))
+
+    queryset = queryset.filter(Exists(rows.filter(ingredient__in=include)))
+    if mode != 'best':
+        return queryset
+
+    return queryset.annotate(
+        matched_ingredients=count_recipe_ingredients(
+            rows.filter(ingredient__in=include)
+        ),
+        missing_ingredients=count_recipe_ingredients(
+            rows.exclude(ingredient__in=include)
+        ),
+    ).order_by('-matched_ingredients', 'missing_ingredients', '-pub_date')
+
+
+def get_feed(queryset, user, strategy):
+    if strategy == 'read':
+        return subscribed_recipes(queryset, user)
+
+    pull_authors = list(Subscription.objects.filter(
+        user=user, author__followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).values_list('author_id', flat=True))
+    if not pull_authors:
+        return queryset.filter(feed_items__user=user)
+
+    return queryset.filter(
+        Q(id__in=FeedItem.objects.filter(user=user).values('recipe'))
+        | Q(author__in=pull_authors)
+    )
+
+
+def fan_out_recipe(recipe):
+    if User.objects.filter(
+        pk=recipe.author_id,
+        followers_count__gt=settings.FEED_FANOUT_LIMIT
+    ).exists():
+        return
+
+    followers = Subscription.objects.filter(
+        author_id=recipe.author_id
+    ).values_list('user_id', flat=True)
+    FeedItem.objects.bulk_create(
+        [FeedItem(user_id=user_id, recipe=recipe) for user_id in followers],
+        ignore_conflicts=True,
+    )
+
+
+def backfill_feed(user_id, author_id):
+    recipes = Recipe.objects.filter(
+        author_id=author_id
+    ).values_list('id', flat=True)[:settings.FEED_BACKFILL]
+    FeedItem.objects.bulk_create(
+        [FeedItem(user_id=user_id, recipe_id=id) for id in recipes],
+        ignore_conflicts=True,
+    )
+
+
+def change_counter(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta})
+
+
+def relation_changed(model, user_id, target_ids, delta):
+    if not target_ids:
+        return
+
+    if model is Favorite:
+        change_counter(
+            Recipe.objects.filter(id__in=target_ids), 'favorites_count', delta
+        )
+    elif model is ShoppingCart:
+        change_shopping_totals(user_id, target_ids, delta)
+    elif model is Subscription:
+        change_counter(
+            User.objects.filter(id__in=target_ids), 'followers_count', delta
+        )
+        for author_id in target_ids:
+            if delta > 0:
+                backfill_feed(user_id, author_id)
+            else:
+                FeedItem.objects.filter(
+                    user_id=user_id, recipe__author_id=author_id
+                ).delete()
+
+
+def toggle_relation(model, create, **values):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = [quote(model._meta.get_field(name).column) for name in values]
+
+    if create:
+        sql = (
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join(["%s"] * len(columns))}) '
+            'ON CONFLICT DO NOTHING RETURNING id'
+        )
+    else:
+        condition = ' AND '.join(f'{column} = %s' for column in columns)
+        sql = f'DELETE FROM {table} WHERE {condition} RETURNING id'
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, list(values.values()))
+        return cursor.fetchone() is not None
+
+
+def id_array(ids):
+    if connection.vendor == 'postgresql':
+        return 'SELECT unnest(%s::integer[])', [list(ids)]
+    return 'SELECT value FROM json_each(%s)', [json.dumps(list(ids))]
+
+
+def toggle_relations(model, create, user_id, recipe_ids):
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    user = quote(model._meta.get_field('user').column)
+    recipe = quote(model._meta.get_field('recipe').column)
+    ids, params = id_array(recipe_ids)
+
+    if create:
+        sql = (
+            f'INSERT INTO {table} ({user}, {recipe}) '
+            f'SELECT %s, id FROM {quote(Recipe._meta.db_table)} '
+            f'WHERE id IN ({ids}) ON CONFLICT DO NOTHING RETURNING {recipe}'
+        )
+    else:
+        sql = (
+            f'DELETE FROM {table} WHERE {user} = %s '
+            f'AND {recipe} IN ({ids}) RETURNING {recipe}'
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *params])
+        return [id for id, in cursor.fetchall()]
+
+
+def validate_ids(model, ids, message):
+    ids_set = set()
+    for id in ids:
+        try:
+            ids_set.add(int(id))
+        except (TypeError, ValueError):
+            raise ValidationError(message.format(id))
+
+    existing = set(model.objects.filter(
+        id__in=ids_set
+    ).values_list('id', flat=True))
+    for id in sorted(ids_set - existing):
+        raise ValidationError(message.format(id))
+
+    return ids_set
+
+
+def update_recipe_ingredients(recipe, ingredients):
+    amounts = {
+        int(ingredient.get('id')): int(ingredient.get('amount'))
+        for ingredient in ingredients
+    }
+    stored = {row.ingredient_id: row for row in recipe.recipe_ingredient.all()}
+    before = {id: row.amount for id, row in stored.items()}
+
+    to_delete = [
+        row.id for id, row in stored.items() if id not in amounts
+    ]
+    to_update = []
+    for id, row in stored.items():
+        if id in amounts and row.amount != amounts[id]:
+            row.amount = amounts[id]
+            to_update.append(row)
+    to_create = [
+        IngredientRecipe(recipe=recipe, ingredient_id=id, amount=amount)
+        for id, amount in amounts.items() if id not in stored
+    ]
+
+    if to_delete:
+        IngredientRecipe.objects.filter(id__in=to_delete).delete()
+    if to_update:
+        IngredientRecipe.objects.bulk_update(to_update, ('amount',))
+    if to_create:
+        IngredientRecipe.objects.bulk_create(to_create)
+
+    return amount_changes(before, amounts)
+
+
+def get_recipe_state(pk, user):
+    flags = recipe_flags(user)
+    if not user.is_anonymous:
+        flags['is_subscribed'] = Exists(Subscription.objects.filter(
+            author=OuterRef('author'), user=user
+        ))
+
+    try:
+        return Recipe.objects.filter(pk=pk).annotate(**flags).values_list(
+            'updated_at', *flags,
+            'author__email', 'author__username',
+            'author__first_name', 'author__last_name',
+        ).first()
+    except (TypeError, ValueError):
+        return None
+
+
 def create_update_recipe(validated_data, author=None, instance=None):
     tags = validated_data.pop('tags')
     ingredients = validated_data.pop('ingredients')
 
-    if instance is None:
-        recipe = Recipe.objects.create(author=author, **validated_data)
-    else:
-        recipe = instance
-
-    recipe.tags.set(tags)
+    if instance is not None:
+        stored_tags = {tag.id for tag in instance.tags.all()}
+        if stored_tags != {int(tag) for tag in tags}:
+            instance.tags.set(tags)
+        changes = update_recipe_ingredients(instance, ingredients)
+        if changes:
+            change_recipe_shopping_totals(instance.id, changes)
+        get_search_backend().refresh([instance.id])
+        if not instance.image_variants:
+            schedule_image_variants(instance)
+        return instance
 
+    recipe = Recipe.objects.create(author=author, **validated_data)
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe=recipe, tag_id=tag) for tag in tags
+    ])
     IngredientRecipe.objects.bulk_create([
         IngredientRecipe(
             recipe=recipe,
             amount=ingredient.get('amount'),
-            ingredient=Ingredient.objects.get(
-                id=ingredient.get('id')
-            ),
+            ingredient_id=ingredient.get('id'),
         ) for ingredient in ingredients
     ])
+    get_search_backend().refresh([recipe.id])
+    schedule_image_variants(recipe)
+    recipe.is_favorited = recipe.is_in_shopping_cart = False
 
     return recipe
 
 
+def get_pk(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise Http404
+
+
 def post_or_del_view(request, model, recipeserializer, **kwargs):
     user = request.user
-    recipe = get_object_or_404(Recipe, pk=kwargs['pk'])
+    pk = get_pk(kwargs['pk'])
+
+    if request.method == 'DELETE':
+        with transaction.atomic():
+            if toggle_relation(model, False, user=user.id, recipe=pk):
+                relation_changed(model, user.id, [pk], -1)
+                return Response(status=status.HTTP_204_NO_CONTENT)
+
+        get_object_or_404(Recipe, pk=pk)
+        return Response(
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    recipe = get_object_or_404(Recipe, pk=pk)
     data = {
         'id': recipe.id,
         'name': recipe.name,
         'image': recipe.image,
+        'image_variants': recipe.image_variants,
         'cooking_time': recipe.cooking_time,
     }
-    model_obj = model.objects.filter(
-        user=user, recipe=recipe
+    serializer = recipeserializer(
+        instance=data,
+        data=request.data,
+        context={'request': request}
     )
+    serializer.is_valid(raise_exception=True)
 
-    if request.method == 'POST':
-        serializer = recipeserializer(
-            instance=data,
-            data=request.data,
-            context={'request': request}
-        )
-        serializer.is_valid(raise_exception=True)
-
-        if model_obj.exists() is False:
-            model.objects.get_or_create(
-                user=user, recipe=recipe
-            )
+    with transaction.atomic():
+        if toggle_relation(model, True, user=user.id, recipe=recipe.id):
+            relation_changed(model, user.id, [recipe.id], 1)
             return Response(
                 serializer.data, status=status.HTTP_200_OK
             )
 
-    if request.method == 'DELETE':
-        if model_obj.exists():
-            model_obj.delete()
-            return Response(status=status.HTTP_204_NO_CONTENT)
-
-        return Response(
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
     return Response(
         serializer.errors,
         status=status.HTTP_400_BAD_REQUEST
     )
+
+
+def get_bulk_id(value):
+    if (
+        isinstance(value, bool) or not isinstance(value, (int, str))
+        or not str(value).isdecimal()
+    ):
+        raise ValidationError({'recipes': 'id рецепта должен быть числом.'})
+    return int(value)
+
+
+def get_bulk_ids(data):
+    ids = data.get('recipes') if isinstance(data, dict) else data
+
+    if not isinstance(ids, list) or not 0 < len(ids) <= BULK_LIMIT:
+        raise ValidationError({
+            'recipes': f'Передайте список из 1-{BULK_LIMIT} id рецептов.'
+        })
+    return list(dict.fromkeys(get_bulk_id(id) for id in ids))
+
+
+def bulk_post_or_del_view(request, model):
+    user = request.user
+    ids = get_bulk_ids(request.data)
+    create = request.method == 'POST'
+
+    with transaction.atomic():
+        changed = set(toggle_relations(model, create, user.id, ids))
+        relation_changed(model, user.id, list(changed), 1 if create else -1)
+        existing = set(Recipe.objects.filter(
+            id__in=set(ids) - changed
+        ).values_list('id', flat=True))
+
+    statuses = ('created', 'exists') if create else ('deleted', 'missing')
+    return Response({'results': [
+        {
+            'id': id,
+            'status': statuses[0] if id in changed
+            else statuses[1] if id in existing else 'not_found',
+        } for id in ids
+    ]}, status=status.HTTP_200_OK)
@@ -1,22 +1,41 @@
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
-from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Subscription, Tag)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingCart,
+                            ShoppingCartIngredient, Subscription, Tag)
+from recipes.versions import get_version
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
 
-from .filters import IngredientFilter, RecipeFilter
+from .cache import get_response_cache_key, response_cache
+from .filters import RecipeFilter
+from .indexes import ingredient_index
+from .mixins import ValuesReadMixin, VersionETagMixin, conditional_response
+from .pagination import RecipeCursorPagination, RecipePagination
 from .permissions import IsAuthorOrAdminOrReadOnly
+from .plans import INGREDIENT_PLAN, TAG_PLAN, recipe_values, serialize_recipes
+from .renderers import (FastJSONRenderer, ShoppingListCSVRenderer,
+                        ShoppingListJSONRenderer, ShoppingListTextRenderer)
 from .serializers import (CustomUserSerializer, IngredientSerializer,
                           RecipeMiniSerializer, RecipeSerializer,
+                          ShoppingCartIngredientSerializer,
                           SubscribeSerializer, TagSerializer)
-from .utils import post_or_del_view
+from .utils import (FEED_STRATEGIES, annotate_is_subscribed,
+                    annotate_recipe_flags, annotate_subscriptions,
+                    bulk_post_or_del_view, get_feed, get_pk, get_recipe_state,
+                    get_recipes_limit, post_or_del_view,
+                    recipe_ingredients_prefetch, relation_changed,
+                    toggle_relation)
 
 User = get_user_model()
 
@@ -24,6 +43,18 @@ User = get_user_model()
 class CustomUserViewSet(UserViewSet):
     queryset = User.objects.all()
     serializer_class = CustomUserSerializer
+    query_budgets = {
+        'list': 3,
+        'retrieve': 2,
+        'me': 1,
+        'subscriptions': 4,
+        'subscribe': 8,
+    }
+
+    def get_queryset(self):
+        return annotate_is_subscribed(
+            super().get_queryset(), self.request.user
+        )
 
     @action(
         detail=True,
@@ -32,35 +63,39 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscribe(self, request, **kwargs):
         user = request.user
-        author = get_object_or_404(User, id=kwargs['id'])
-
-        if request.method == 'POST':
-            serializer = SubscribeSerializer(
-                instance=author,
-                data=request.data,
-                context={'request': request}
-            )
-            serializer.is_valid(raise_exception=True)
-            Subscription.objects.get_or_create(
-                user=user, author=author
-            )
-            return Response(
-                serializer.data, status=status.HTTP_201_CREATED
-            )
+        author_id = get_pk(kwargs['id'])
 
         if request.method == 'DELETE':
-            subscribtion = Subscription.objects.filter(
-                user=user, author=author
-            )
-            if subscribtion.exists():
-                subscribtion.delete()
-                return Response(status=status.HTTP_204_NO_CONTENT)
+            with transaction.atomic():
+                if toggle_relation(
+                    Subscription, False, user=user.id, author=author_id
+                ):
+                    relation_changed(Subscription, user.id, [author_id], -1)
+                    return Response(status=status.HTTP_204_NO_CONTENT)
 
+            get_object_or_404(User, id=author_id)
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
+        author = get_object_or_404(User, id=author_id)
+        serializer = SubscribeSerializer(
+            instance=author,
+            data=request.data,
+            context={'request': request}
+        )
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            if not toggle_relation(
+                Subscription, True, user=user.id, author=author.id
+            ):
+                raise ValidationError(
+                    f'Вы уже подписаны на пользователя: {author}.'
+                )
+            relation_changed(Subscription, user.id, [author.id], 1)
+
+        author.is_subscribed = True
         return Response(
-            serializer.errors,
-            status=status.HTTP_400_BAD_REQUEST
+            serializer.data, status=status.HTTP_201_CREATED
         )
 
     @action(
@@ -68,8 +103,12 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def subscriptions(self, request):
-        subscriptions = User.objects.filter(
-            subscription__user=request.user
+        subscriptions = annotate_subscriptions(
+            User.objects.filter(
+                subscription__user=request.user
+            ).order_by('username'),
+            request.user,
+            get_recipes_limit(request)
         )
         page = self.paginate_queryset(subscriptions)
         serializer = SubscribeSerializer(
@@ -80,30 +119,131 @@ class CustomUserViewSet(UserViewSet):
         return self.get_paginated_response(serializer.data)
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(
+    VersionETagMixin, ValuesReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filterset_class = IngredientFilter
+    read_plan = INGREDIENT_PLAN
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
     pagination_class = None
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    version_name = 'ingredients'
+    query_budgets = {'list': 2, 'retrieve': 2}
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional_response(
+            request, lambda: Response(
+                ingredient_index.search(request.query_params.get('name', ''))
+            )
+        )
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(
+    VersionETagMixin, ValuesReadMixin, viewsets.ReadOnlyModelViewSet
+):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    read_plan = TAG_PLAN
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
     pagination_class = None
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    version_name = 'tags'
+    query_budgets = {'list': 2, 'retrieve': 2}
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    queryset = (
-        Recipe.objects.select_related('author')
-        .prefetch_related('ingredients', 'tags')
+class RecipeViewSet(ValuesReadMixin, viewsets.ModelViewSet):
+    queryset = Recipe.objects.prefetch_related(
+        recipe_ingredients_prefetch(), 'tags'
     )
     serializer_class = RecipeSerializer
     filter_backends = (DjangoFilterBackend,)
     filter_class = RecipeFilter
+    pagination_class = RecipePagination
     permission_classes = (IsAuthorOrAdminOrReadOnly,)
+    renderer_classes = (FastJSONRenderer, BrowsableAPIRenderer)
+    query_budgets = {
+        'list': 10,
+        'retrieve': 6,
+        'create': 20,
+        'update': 28,
+        'partial_update': 28,
+        'destroy': 15,
+        'feed': 6,
+        'favorite': 5,
+        'shopping_cart': 9,
+        'favorite_bulk': 5,
+        'shopping_cart_bulk': 9,
+        'shopping_cart_summary': 2,
+        'download_shopping_cart': 2,
+    }
+
+    def get_queryset(self):
+        return annotate_recipe_flags(super().get_queryset(), self.request.user)
+
+    def get_values_queryset(self):
+        return recipe_values(self.filter_queryset(self.get_queryset()))
+
+    def serialize_values(self, rows):
+        return serialize_recipes(rows, self.request)
+
+    def list(self, request, *args, **kwargs):
+        cache_key = get_response_cache_key(request)
+        data = response_cache.get(cache_key) if cache_key else None
+        if data is not None:
+            return Response(data)
+
+        response = super().list(request, *args, **kwargs)
+        if cache_key:
+            response_cache.set(cache_key, response.data)
+        return response
+
+    def get_recipe_etag(self, request, pk):
+        state = get_recipe_state(pk, request.user)
+        if state is None:
+            return None
+
+        updated_at, *state = state
+        versions = (get_version('tags'), get_version('ingredients'))
+        etag = ':'.join(map(str, (
+            pk, updated_at.timestamp(), *state, *versions
+        )))
+        last_modified = (
+            int(max(
+                updated_at.timestamp(), *versions, get_version('recipes')
+            ))
+            if request.user.is_anonymous else None
+        )
+        return etag, last_modified
+
+    def retrieve(self, request, *args, **kwargs):
+        cache_key = get_response_cache_key(request)
+        cached = response_cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            etag, last_modified, data = cached
+            return conditional_response(
+                request, etag, partial(Response, data), last_modified
+            )
+
+        conditions = self.get_recipe_etag(request, kwargs['pk'])
+        if conditions is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        etag, last_modified = conditions
+
+        def get_response():
+            response = super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            )
+            if cache_key:
+                response_cache.set(
+                    cache_key, (etag, last_modified, response.data)
+                )
+            return response
+
+        return conditional_response(
+            request, etag, get_response, last_modified
+        )
 
     @action(
         detail=True,
@@ -125,22 +265,81 @@ class RecipeViewSet(viewsets.ModelViewSet):
             request, ShoppingCart, RecipeMiniSerializer, **kwargs
         )
 
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite/bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        return bulk_post_or_del_view(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='shopping_cart/bulk',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        return bulk_post_or_del_view(request, ShoppingCart)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=RecipeCursorPagination
+    )
+    def feed(self, request):
+        strategy = request.query_params.get('strategy', settings.FEED_STRATEGY)
+        if strategy not in FEED_STRATEGIES:
+            raise ValidationError({
+                'strategy': 'Допустимые значения: {}.'.format(
+                    ', '.join(FEED_STRATEGIES)
+                )
+            })
+
+        queryset = self.filter_queryset(
+            get_feed(self.get_queryset(), request.user, strategy)
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(
         detail=False,
         permission_classes=(IsAuthenticated,)
     )
+    def shopping_cart_summary(self, request):
+        shopping_cart = ShoppingCartIngredient.objects.filter(
+            user=request.user,
+        ).select_related('ingredient').order_by('ingredient__name')
+        serializer = ShoppingCartIngredientSerializer(
+            shopping_cart, many=True
+        )
+        return Response(serializer.data)
+
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(
+            ShoppingListTextRenderer,
+            ShoppingListCSVRenderer,
+            ShoppingListJSONRenderer,
+        )
+    )
     def download_shopping_cart(self, request):
-        shopping_cart = IngredientRecipe.objects.filter(
-            recipe__shopping_recipe__user=request.user,
+        shopping_cart = ShoppingCartIngredient.objects.filter(
+            user=request.user,
         ).order_by('ingredient__name').values_list(
             'ingredient__name',
-            'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-
-        download_list = f'Список покупок пользователя {request.user}:\n'
-        for num, (name, unit, amount) in enumerate(shopping_cart, start=1):
-            download_list += f'{num}. {name} ({unit}) - {amount}\n'
-        filename = 'data.txt'
-        response = HttpResponse(download_list, content_type='text/plain')
+            'ingredient__measurement_unit',
+            'amount'
+        )
+
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(
+            renderer.stream(shopping_cart.iterator(), request.user),
+            content_type=f'{renderer.media_type}; charset=utf-8'
+        )
+        filename = f'shopping_list.{renderer.format}'
         response['Content-Disposition'] = f'attachment; filename={filename}'
         return response
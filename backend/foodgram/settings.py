@@ -37,7 +37,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated'
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 6,
@@ -58,6 +58,7 @@ DJOSER = {
 }
 
 MIDDLEWARE = [
+    'api.middleware.QueryCountMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -102,6 +103,32 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', default=(
+            'django.core.cache.backends.memcached.PyMemcacheCache'
+            if os.getenv('CACHE_LOCATION')
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        )),
+        'LOCATION': os.getenv('CACHE_LOCATION', default=''),
+    }
+}
+
+RESPONSE_CACHE = {
+    'BACKEND': os.getenv('RESPONSE_CACHE_BACKEND', default='api.cache.LRUCache'),
+    'OPTIONS': {
+        'timeout': int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300)),
+    },
+}
+
+AUTH_TOKEN_CACHE = {
+    'BACKEND': os.getenv('AUTH_TOKEN_CACHE_BACKEND', default='api.cache.LRUCache'),
+    'OPTIONS': {
+        'timeout': int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', default=60)),
+        'max_entries': int(os.getenv('AUTH_TOKEN_CACHE_MAX_ENTRIES', default=10000)),
+    },
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'
@@ -132,3 +159,32 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', default=5 * 1024 * 1024))
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', default=24_000_000))
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', default=2))
+
+FEED_STRATEGY = os.getenv('FEED_STRATEGY', default='read')
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_BACKFILL = int(os.getenv('FEED_BACKFILL', default=50))
+
+QUERY_COUNT_HEADERS = os.getenv('QUERY_COUNT_HEADERS', default=str(DEBUG)) == 'True'
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', default='False') == 'True'
+
+FAST_SERIALIZATION = os.getenv('FAST_SERIALIZATION', default='True') == 'True'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'api.queries': {
+            'handlers': ['console'],
+            'level': os.getenv('QUERY_LOG_LEVEL', default='WARNING'),
+        },
+    },
+}
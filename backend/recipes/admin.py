@@ -1,7 +1,10 @@
 from django.contrib import admin
 
+from .images import schedule_image_variants
 from .models import (Favorite, Ingredient, IngredientRecipe, Recipe,
                      ShoppingCart, Subscription, Tag)
+from .search import get_search_backend
+from .shopping import track_shopping_totals
 
 
 class IngredientAdmin(admin.ModelAdmin):
@@ -25,7 +28,7 @@ class TagAdmin(admin.ModelAdmin):
 
 
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('image_tag', 'name', 'author', 'favorite_count')
+    list_display = ('image_tag', 'name', 'author', 'favorites_count')
     list_display_links = ('image_tag', 'name',)
     readonly_fields = ('image_tag',)
     search_fields = ('name',)
@@ -33,11 +36,52 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (IngredientRecipeInline,)
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        if 'image' in form.changed_data:
+            obj.image_variants = {}
+        super().save_model(request, obj, form, change)
+        if not obj.image_variants:
+            schedule_image_variants(obj)
+
+    def save_related(self, request, form, formsets, change):
+        with track_shopping_totals([form.instance.id] if change else []):
+            super().save_related(request, form, formsets, change)
+        get_search_backend().refresh([form.instance.id])
+
+
+def recipe_ingredients_changed(recipes):
+    for recipe in recipes:
+        recipe.save(update_fields=('updated_at',))
+    get_search_backend().refresh([recipe.id for recipe in recipes])
+
+
+class IngredientRecipeAdmin(admin.ModelAdmin):
+    def save_model(self, request, obj, form, change):
+        recipes = {obj.recipe}
+        if change:
+            recipes.add(IngredientRecipe.objects.get(pk=obj.pk).recipe)
+        with track_shopping_totals({recipe.id for recipe in recipes}):
+            super().save_model(request, obj, form, change)
+        recipe_ingredients_changed(recipes)
+
+    def delete_model(self, request, obj):
+        with track_shopping_totals([obj.recipe_id]):
+            super().delete_model(request, obj)
+        recipe_ingredients_changed([obj.recipe])
+
+    def delete_queryset(self, request, queryset):
+        recipes = list(Recipe.objects.filter(
+            recipe_ingredient__in=queryset
+        ).distinct())
+        with track_shopping_totals([recipe.id for recipe in recipes]):
+            super().delete_queryset(request, queryset)
+        recipe_ingredients_changed(recipes)
+
 
 admin.site.register(Ingredient, IngredientAdmin)
 admin.site.register(Tag, TagAdmin)
 admin.site.register(Recipe, RecipeAdmin)
-admin.site.register(IngredientRecipe)
+admin.site.register(IngredientRecipe, IngredientRecipeAdmin)
 admin.site.register(Subscription)
 admin.site.register(Favorite)
 admin.site.register(ShoppingCart)
@@ -0,0 +1,107 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .versions import bump_version
+
+logger = logging.getLogger(__name__)
+
+IMAGE_VARIANTS = {
+    'thumb': (150, 150),
+    'card': (600, 600),
+    'detail': (1200, 1200),
+}
+IMAGE_FORMATS = (
+    ('jpeg', 'JPEG', 'jpg'),
+    ('webp', 'WEBP', 'webp'),
+)
+IMAGE_QUALITY = 82
+VARIANTS_DIR = 'recipes/images/variants'
+
+executor = SimpleLazyObject(lambda: ThreadPoolExecutor(
+    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='images'
+))
+
+
+def save_variant(name, image, image_format):
+    if default_storage.exists(name):
+        return name
+
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=IMAGE_QUALITY)
+    return default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def make_variants(storage, name):
+    stem = os.path.splitext(os.path.basename(name))[0]
+    variants = {}
+
+    with storage.open(name) as file, Image.open(file) as source:
+        width, height = source.size
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise ValueError(
+                f'Изображение {name} {width}x{height} слишком большое.'
+            )
+        source = ImageOps.exif_transpose(source)
+        if source.mode not in ('RGB', 'RGBA'):
+            source = source.convert('RGBA')
+        for variant, size in IMAGE_VARIANTS.items():
+            image = source.copy()
+            image.thumbnail(size, Image.LANCZOS)
+            variants[variant] = {
+                key: save_variant(
+                    f'{VARIANTS_DIR}/{stem}_{variant}.{extension}',
+                    image, image_format
+                )
+                for key, image_format, extension in IMAGE_FORMATS
+            }
+
+    return variants
+
+
+def generate_image_variants(recipe_id):
+    try:
+        recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+        if recipe is None or not recipe.image:
+            return
+
+        variants = make_variants(recipe.image.storage, recipe.image.name)
+        Recipe.objects.filter(
+            pk=recipe_id, image=recipe.image.name
+        ).update(image_variants=variants, updated_at=timezone.now())
+        bump_version('recipes')
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def schedule_image_variants(recipe):
+    transaction.on_commit(
+        partial(executor.submit, generate_image_variants, recipe.id)
+    )
+
+
+def image_variant_urls(variants, build_absolute_uri=None):
+    build_absolute_uri = build_absolute_uri or (lambda url: url)
+    return {
+        variant: {
+            key: build_absolute_uri(default_storage.url(name))
+            for key, name in names.items()
+        }
+        for variant, names in (variants or {}).items()
+    }
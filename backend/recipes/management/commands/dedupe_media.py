@@ -0,0 +1,97 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from recipes.models import Recipe
+from recipes.versions import bump_version
+
+
+def walk(storage, path):
+    if not storage.exists(path):
+        return
+    directories, files = storage.listdir(path)
+    for filename in files:
+        yield f'{path}/{filename}'
+    for directory in directories:
+        yield from walk(storage, f'{path}/{directory}')
+
+
+def relink_images(storage, dry_run):
+    relinked = {}
+    images = Recipe.objects.exclude(image='').values_list('id', 'image')
+
+    for recipe_id, name in images.iterator():
+        if not storage.exists(name):
+            continue
+        with storage.open(name) as file:
+            hashed_name = storage.get_hashed_name(name, file)
+            if hashed_name == name:
+                continue
+            if not dry_run:
+                hashed_name = storage.save(name, file)
+        if not dry_run:
+            Recipe.objects.filter(
+                pk=recipe_id, image=name
+            ).update(image=hashed_name, updated_at=timezone.now())
+        relinked[name] = hashed_name
+
+    return relinked
+
+
+def referenced_files(relinked):
+    referenced = set(relinked.values())
+    images = Recipe.objects.values_list('image', 'image_variants')
+
+    for image, variants in images.iterator():
+        referenced.add(relinked.get(image, image))
+        for names in variants.values():
+            referenced.update(names.values())
+
+    return referenced
+
+
+def collect_garbage(storage, path, relinked, grace, dry_run):
+    referenced = referenced_files(relinked)
+    threshold = timezone.now() - grace
+    removed = freed = 0
+
+    for name in walk(storage, path):
+        if name in referenced or storage.get_modified_time(name) > threshold:
+            continue
+        removed += 1
+        freed += storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+
+    return removed, freed
+
+
+class Command(BaseCommand):
+    help = ('Дедупликация изображений рецептов '
+            'и удаление файлов без ссылок')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, что будет сделано'
+        )
+        parser.add_argument(
+            '--grace', type=int, default=24,
+            help='Не удалять файлы моложе указанного числа часов'
+        )
+
+    def handle(self, *args, **options):
+        field = Recipe._meta.get_field('image')
+        dry_run = options['dry_run']
+
+        relinked = relink_images(field.storage, dry_run)
+        if relinked and not dry_run:
+            bump_version('recipes')
+        removed, freed = collect_garbage(
+            field.storage, field.upload_to.rstrip('/'), relinked,
+            timedelta(hours=options['grace']), dry_run
+        )
+
+        return (f'Перепривязано рецептов: {len(relinked)}, '
+                f'удалено файлов: {removed}, '
+                f'освобождено: {freed // 1024} КБ')
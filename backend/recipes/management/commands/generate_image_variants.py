@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.images import generate_image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных вариантов изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Обработать все рецепты, а не только без вариантов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+
+        ids = list(recipes.values_list('id', flat=True))
+        for recipe_id in ids:
+            generate_image_variants(recipe_id)
+        return f'Обработано изображений: {len(ids)}'
@@ -1,33 +1,134 @@
 import csv
+import json
 import os
 
 from django.conf import settings
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
 from recipes.models import Ingredient, Tag
+from recipes.utils import batched
+from recipes.versions import bump_version
+
+INGREDIENT_FIELDS = ('name', 'measurement_unit')
+TAG_FIELDS = ('name', 'color', 'slug')
+
+
+def read_rows(path, fields):
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.csv', '.json'):
+        raise CommandError(f'Неподдерживаемый формат файла: {path}')
+    if not os.path.isfile(path):
+        raise CommandError(f'Файл не найден: {path}')
+
+    with open(path, encoding='utf-8') as file:
+        if extension == '.csv':
+            rows = csv.reader(file)
+        else:
+            rows = (
+                [item.get(field) for field in fields]
+                for item in json.load(file)
+            )
+        for row in rows:
+            row = tuple(str(value or '').strip() for value in row)
+            if any(row) and row != fields:
+                yield row
+
+
+def insert_ingredients(rows):
+    existing = set(Ingredient.objects.filter(
+        name__in={name for name, _ in rows}
+    ).values_list('name', 'measurement_unit'))
+    new = [row for row in dict.fromkeys(rows) if row not in existing]
+
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=measurement_unit)
+            for name, measurement_unit in new
+        ),
+        ignore_conflicts=True,
+    )
+    return len(new), 0
+
+
+def upsert_tags(rows):
+    existing = {
+        tag.slug: tag for tag in Tag.objects.filter(
+            Q(slug__in=[slug for *_, slug in rows])
+            | Q(name__in=[name for name, *_ in rows])
+        )
+    }
+    names = {tag.name for tag in existing.values()}
+    changed = {}
+    new = {}
+    for name, color, slug in rows:
+        tag = existing.get(slug)
+        if tag is None:
+            if name not in names and slug not in new:
+                names.add(name)
+                new[slug] = Tag(name=name, color=color, slug=slug)
+        elif (tag.name, tag.color) != (name, color):
+            tag.name, tag.color = name, color
+            changed[slug] = tag
+
+    Tag.objects.bulk_create(new.values(), ignore_conflicts=True)
+    Tag.objects.bulk_update(changed.values(), ('name', 'color'))
+    return len(new), len(changed)
 
 
 class Command(BaseCommand):
-    help = 'Загрузка данных в базу из ingredients.csv и tags.csv'
-
-    def handle(self, *args, **kwargs):
-        with open(os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
-                  'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)
-            ingredients_to_add = [Ingredient(name=row[0],
-                                  measurement_unit=row[1]) for row in reader]
-            Ingredient.objects.bulk_create(ingredients_to_add)
-
-        with open(os.path.join(settings.BASE_DIR, 'data/tags.csv'),
-                  'r', encoding='utf-8') as csv_file:
-            reader = csv.reader(csv_file)
-            next(reader)
-            tags_to_add = [Tag(name=row[0],
-                           color=row[1],
-                           slug=row[2]) for row in reader]
-            Tag.objects.bulk_create(tags_to_add)
-
-        return (
-            f'Ингредиентов в БД: {Ingredient.objects.count()}\n'
-            f'Тегов в БД: {Tag.objects.count()}'
+    help = 'Загрузка ингредиентов и тегов в базу из CSV или JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ingredients',
+            default=os.path.join(settings.BASE_DIR, 'data/ingredients.csv'),
+            help='Файл с ингредиентами: name, measurement_unit'
+        )
+        parser.add_argument(
+            '--tags',
+            default=os.path.join(settings.BASE_DIR, 'data/tags.csv'),
+            help='Файл с тегами: name, color, slug'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.batch_size = options['batch_size']
+        ingredients = self.load(
+            Ingredient, options['ingredients'], INGREDIENT_FIELDS,
+            insert_ingredients
+        )
+        tags = self.load(Tag, options['tags'], TAG_FIELDS, upsert_tags)
+
+        if ingredients['inserted']:
+            bump_version('ingredients')
+        if tags['inserted'] or tags['updated']:
+            bump_version('tags')
+        if tags['updated']:
+            bump_version('recipes')
+
+        return '\n'.join(
+            f'{title}: добавлено {stats["inserted"]}, '
+            f'обновлено {stats["updated"]}, пропущено {stats["skipped"]}, '
+            f'всего в БД {model.objects.count()}'
+            for title, model, stats in (
+                ('Ингредиенты', Ingredient, ingredients),
+                ('Теги', Tag, tags),
+            )
         )
+
+    def load(self, model, path, fields, write):
+        stats = dict.fromkeys(('inserted', 'updated', 'skipped'), 0)
+
+        with transaction.atomic():
+            for batch in batched(read_rows(path, fields), self.batch_size):
+                rows = [
+                    row for row in batch
+                    if len(row) == len(fields) and all(row)
+                ]
+                inserted, updated = write(rows)
+                stats['inserted'] += inserted
+                stats['updated'] += updated
+                stats['skipped'] += len(batch) - inserted - updated
+
+        return stats
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import Favorite, Recipe, Subscription
+from users.models import User
+
+
+def count_subquery(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(
+            **{field: OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=Count('pk')
+        ).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт счётчиков избранного, рецептов и подписчиков'
+
+    def recount(self, queryset, field, actual):
+        broken = queryset.annotate(actual=actual).exclude(
+            **{field: F('actual')}
+        ).count()
+        if broken:
+            queryset.update(**{field: actual})
+        return broken
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            recipes = self.recount(
+                Recipe.objects.all(), 'favorites_count',
+                count_subquery(Favorite, 'recipe')
+            )
+            users = self.recount(
+                User.objects.all(), 'recipes_count',
+                count_subquery(Recipe, 'author')
+            )
+            followers = self.recount(
+                User.objects.all(), 'followers_count',
+                count_subquery(Subscription, 'author')
+            )
+
+        return (
+            f'Исправлено счётчиков избранного: {recipes}\n'
+            f'Исправлено счётчиков рецептов: {users}\n'
+            f'Исправлено счётчиков подписчиков: {followers}'
+        )
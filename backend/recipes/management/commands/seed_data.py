@@ -0,0 +1,368 @@
+import csv
+import json
+import random
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from recipes.models import (Favorite, FeedItem, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingCartIngredient,
+                            Subscription, Tag)
+from recipes.shopping import rebuild_shopping_totals
+from recipes.utils import batched
+from recipes.versions import bump_version
+from users.models import User
+
+WORDS = (
+    'мука', 'молоко', 'масло', 'морковь', 'мёд', 'соль', 'сахар', 'сыр',
+    'картофель', 'капуста', 'курица', 'перец', 'петрушка', 'лук', 'яйца',
+)
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+START_DATE = datetime(2022, 1, 1, tzinfo=timezone.utc)
+INDEXED_TABLES = (
+    Recipe, IngredientRecipe, Recipe.tags.through, Favorite, ShoppingCart,
+    Subscription, FeedItem,
+)
+
+
+def copy_value(value):
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class BulkWriter:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+
+    def prepare(self, model, fields):
+        quote = connection.ops.quote_name
+        fields = [model._meta.get_field(name) for name in fields]
+        columns = ', '.join(quote(field.column) for field in fields)
+        return fields, f'{quote(model._meta.db_table)} ({columns})'
+
+    def write(self, model, fields, rows):
+        fields, target = self.prepare(model, fields)
+        sql = (
+            f'INSERT INTO {target} '
+            f'VALUES ({", ".join(["%s"] * len(fields))})'
+        )
+        count = 0
+
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                cursor.executemany(sql, [
+                    [
+                        field.get_db_prep_save(value, connection)
+                        for field, value in zip(fields, row)
+                    ] for row in batch
+                ])
+                count += len(batch)
+
+        return count
+
+
+class CopyWriter(BulkWriter):
+    def write(self, model, fields, rows):
+        sql = (
+            f'COPY {self.prepare(model, fields)[1]} '
+            'FROM STDIN WITH (FORMAT csv)'
+        )
+        count = 0
+
+        with connection.cursor() as cursor:
+            for batch in batched(rows, self.batch_size):
+                buffer = StringIO()
+                csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(
+                    [copy_value(value) for value in row] for row in batch
+                )
+                buffer.seek(0)
+                cursor.copy_expert(sql, buffer)
+                count += len(batch)
+
+        return count
+
+
+def get_indexes(tables):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT indexname, indexdef FROM pg_indexes '
+                'WHERE schemaname = current_schema() '
+                'AND tablename = ANY(%s) '
+                'AND indexname NOT IN (SELECT conname FROM pg_constraint)',
+                [list(tables)]
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                'SELECT name, sql FROM sqlite_master WHERE type = %s '
+                f'AND tbl_name IN ({", ".join(["%s"] * len(tables))}) '
+                'AND sql IS NOT NULL AND sql NOT LIKE %s',
+                ['index', *tables, 'CREATE UNIQUE%']
+            )
+        else:
+            return []
+        return cursor.fetchall()
+
+
+@contextmanager
+def dropped_indexes(models):
+    indexes = get_indexes([model._meta.db_table for model in models])
+
+    with connection.cursor() as cursor:
+        for name, _ in indexes:
+            cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+    yield len(indexes)
+    with connection.cursor() as cursor:
+        for _, definition in indexes:
+            cursor.execute(definition)
+
+
+def skewed(rng, start, size, exponent=1.1):
+    if not size:
+        return lambda k: []
+    weights = list(accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+    return lambda k: [
+        start + index
+        for index in rng.choices(range(size), cum_weights=weights, k=k)
+    ]
+
+
+def next_id(model):
+    last = model.objects.order_by('-pk').values_list('pk', flat=True).first()
+    return (last or 0) + 1
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических данных для нагрузочного тестирования'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100_000)
+        parser.add_argument('--recipes', type=int, default=1_000_000)
+        parser.add_argument(
+            '--ingredients', type=int, default=2_000,
+            help='Сколько ингредиентов создать, если справочник пуст'
+        )
+        parser.add_argument('--ingredients-per-recipe', type=int, default=10)
+        parser.add_argument('--favorites', type=int, default=20)
+        parser.add_argument('--carts', type=int, default=3)
+        parser.add_argument('--subscriptions', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=10_000)
+        parser.add_argument(
+            '--keep-indexes', action='store_true',
+            help='Не удалять индексы на время загрузки'
+        )
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        writer_class = (
+            CopyWriter if connection.vendor == 'postgresql' else BulkWriter
+        )
+        self.writer = writer_class(options['batch_size'])
+        self.report = []
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            self.load_reference_data()
+            if options['keep_indexes']:
+                self.load()
+            else:
+                with dropped_indexes(INDEXED_TABLES) as count:
+                    self.load()
+                self.report.append(f'Пересоздано индексов: {count}')
+            self.reset_sequences()
+
+        self.build_derived_data()
+        rows = sum(self.rows.values())
+        elapsed = time.perf_counter() - started
+        self.report.append(
+            f'Итого: {rows} строк за {elapsed:.1f} с, '
+            f'{rows / elapsed:.0f} строк/с'
+        )
+        return '\n'.join(self.report)
+
+    def write(self, model, fields, rows):
+        started = time.perf_counter()
+        count = self.writer.write(model, fields, rows)
+        self.report_rows(model, count, started)
+
+    def report_rows(self, model, count, started):
+        elapsed = max(time.perf_counter() - started, 1e-6)
+        self.rows[model._meta.db_table] = count
+        self.report.append(
+            f'{model._meta.db_table}: {count} строк за {elapsed:.1f} с, '
+            f'{count / elapsed:.0f} строк/с'
+        )
+
+    def load_reference_data(self):
+        self.rows = {}
+        if not Tag.objects.exists():
+            Tag.objects.bulk_create(
+                Tag(name=name, color=color, slug=slug)
+                for name, color, slug in TAGS
+            )
+        if not Ingredient.objects.exists():
+            self.write(Ingredient, ('name', 'measurement_unit'), (
+                (f'{self.rng.choice(WORDS)} {i}', self.rng.choice(('г', 'мл')))
+                for i in range(self.options['ingredients'])
+            ))
+        self.tag_ids = list(Tag.objects.values_list('id', flat=True))
+        self.ingredient_ids = list(
+            Ingredient.objects.values_list('id', flat=True)
+        )
+
+    def load(self):
+        self.user_start = next_id(User)
+        self.recipe_start = next_id(Recipe)
+        self.load_users()
+        self.load_recipes()
+        self.load_recipe_relations()
+        self.load_user_relations()
+        self.load_feed()
+
+    def load_users(self):
+        password = make_password(None)
+        now = datetime.now(timezone.utc)
+        self.write(User, (
+            'id', 'password', 'is_superuser', 'username', 'first_name',
+            'last_name', 'email', 'is_staff', 'is_active', 'date_joined',
+            'role', 'bio', 'recipes_count', 'followers_count',
+        ), (
+            (
+                id, password, False, f'user{id}', 'Пользователь', str(id),
+                f'user{id}@example.com', False, True, now, 'user', '', 0, 0,
+            ) for id in range(
+                self.user_start, self.user_start + self.options['users']
+            )
+        ))
+
+    def load_recipes(self):
+        authors = skewed(self.rng, self.user_start, self.options['users'])
+        count = self.options['recipes']
+        step = timedelta(days=730) / max(count, 1)
+        self.write(Recipe, (
+            'id', 'author_id', 'name', 'image', 'image_variants', 'text',
+            'cooking_time', 'pub_date', 'updated_at', 'favorites_count',
+        ), (
+            (
+                self.recipe_start + i, author_id,
+                f'{self.rng.choice(WORDS).capitalize()} по-домашнему {i}',
+                'recipes/images/seed.png', {},
+                'Смешать ингредиенты и готовить до готовности.',
+                self.rng.randint(5, 180), START_DATE + step * i,
+                START_DATE + step * i, 0,
+            ) for i, author_id in enumerate(authors(count))
+        ))
+
+    def recipe_ids(self):
+        return range(self.recipe_start, self.recipe_start + self.rows[
+            Recipe._meta.db_table
+        ])
+
+    def load_recipe_relations(self):
+        per_recipe = min(
+            self.options['ingredients_per_recipe'], len(self.ingredient_ids)
+        )
+        self.write(
+            IngredientRecipe, ('recipe_id', 'ingredient_id', 'amount'), (
+                (recipe_id, ingredient_id, self.rng.randint(1, 1000))
+                for recipe_id in self.recipe_ids()
+                for ingredient_id in self.rng.sample(
+                    self.ingredient_ids, per_recipe
+                )
+            )
+        )
+        self.write(Recipe.tags.through, ('recipe_id', 'tag_id'), (
+            (recipe_id, tag_id)
+            for recipe_id in self.recipe_ids()
+            for tag_id in self.rng.sample(
+                self.tag_ids, self.rng.randint(1, len(self.tag_ids))
+            )
+        ))
+
+    def pairs(self, choose, average, exclude_self=False):
+        for user_id in range(
+            self.user_start, self.user_start + self.options['users']
+        ):
+            targets = set(choose(self.rng.randint(0, average * 2)))
+            if exclude_self:
+                targets.discard(user_id)
+            for target_id in sorted(targets):
+                yield user_id, target_id
+
+    def load_user_relations(self):
+        recipes = skewed(self.rng, self.recipe_start, len(self.recipe_ids()))
+        authors = skewed(self.rng, self.user_start, self.options['users'])
+        self.write(Favorite, ('user_id', 'recipe_id'), self.pairs(
+            recipes, self.options['favorites']
+        ))
+        self.write(ShoppingCart, ('user_id', 'recipe_id'), self.pairs(
+            recipes, self.options['carts']
+        ))
+        self.write(Subscription, ('user_id', 'author_id'), self.pairs(
+            authors, self.options['subscriptions'], exclude_self=True
+        ))
+
+    def load_feed(self):
+        started = time.perf_counter()
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {quote(FeedItem._meta.db_table)} '
+                '(user_id, recipe_id) SELECT s.user_id, r.id '
+                f'FROM {quote(Subscription._meta.db_table)} s '
+                'JOIN (SELECT id, author_id, ROW_NUMBER() OVER ('
+                'PARTITION BY author_id ORDER BY pub_date DESC) AS position '
+                f'FROM {quote(Recipe._meta.db_table)}) r '
+                'ON r.author_id = s.author_id AND r.position <= %s '
+                'WHERE s.user_id >= %s',
+                [settings.FEED_BACKFILL, self.user_start]
+            )
+            count = cursor.rowcount
+        self.report_rows(FeedItem, count, started)
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                no_style(), [User, Recipe]
+            ):
+                cursor.execute(sql)
+
+    def build_derived_data(self):
+        started = time.perf_counter()
+        call_command('recount_counters', stdout=StringIO())
+        call_command('update_search_index', stdout=StringIO())
+
+        user_ids = ShoppingCart.objects.filter(
+            user_id__gte=self.user_start
+        ).values_list('user_id', flat=True).distinct().order_by('user_id')
+        for batch in batched(user_ids.iterator(), 1000):
+            rebuild_shopping_totals(batch)
+
+        for name in ('ingredients', 'tags', 'recipes'):
+            bump_version(name)
+        self.report.append(
+            'Счётчики, поисковый индекс и списки покупок: '
+            f'{time.perf_counter() - started:.1f} с, '
+            f'{ShoppingCartIngredient.objects.count()} строк покупок'
+        )
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Перестроение поискового индекса рецептов'
+
+    def handle(self, *args, **kwargs):
+        get_search_backend().refresh()
+        return f'Рецептов в поисковом индексе: {Recipe.objects.count()}'
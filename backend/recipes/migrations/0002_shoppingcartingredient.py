@@ -0,0 +1,54 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_cart_ingredients(apps, schema_editor):
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    totals = IngredientRecipe.objects.filter(
+        recipe__shopping_recipe__isnull=False
+    ).values_list(
+        'recipe__shopping_recipe__user', 'ingredient'
+    ).annotate(amount=models.Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(
+            user_id=user_id, ingredient_id=ingredient_id, amount=amount
+        ) for user_id, ingredient_id, amount in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingCartIngredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_ingredients', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_ingredients', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списка покупок',
+                'ordering': ('user',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcartingredient',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique_shopping_cart_ingredient'),
+        ),
+        migrations.RunPython(
+            fill_shopping_cart_ingredients, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_shoppingcartingredient'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:06
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            **{field: models.OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=models.Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(favorites_count=count_subquery(Favorite, 'recipe'))
+    User.objects.update(recipes_count=count_subquery(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_recipe_updated_at'),
+        ('users', '0004_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество в избранном'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
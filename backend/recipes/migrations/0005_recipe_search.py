@@ -0,0 +1,25 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:20
+
+from django.db import migrations
+from recipes.search import get_search_backend
+
+
+def create_search_index(apps, schema_editor):
+    backend = get_search_backend(schema_editor.connection.vendor)
+    backend.create(schema_editor)
+    backend.refresh()
+
+
+def drop_search_index(apps, schema_editor):
+    get_search_backend(schema_editor.connection.vendor).drop(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_favorites_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
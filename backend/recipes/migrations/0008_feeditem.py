@@ -0,0 +1,61 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:14
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_feed(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('recipes', 'Subscription')
+    User = apps.get_model('users', 'User')
+
+    User.objects.update(followers_count=Coalesce(models.Subquery(
+        Subscription.objects.filter(
+            author=models.OuterRef('pk')
+        ).order_by().values('author').annotate(
+            count=models.Count('pk')
+        ).values('count')
+    ), 0))
+
+    subscriptions = Subscription.objects.values_list('user_id', 'author_id')
+    for user_id, author_id in subscriptions.iterator():
+        recipes = Recipe.objects.filter(author_id=author_id).order_by(
+            '-pub_date'
+        ).values_list('id', flat=True)[:settings.FEED_BACKFILL]
+        FeedItem.objects.bulk_create(
+            [FeedItem(user_id=user_id, recipe_id=id) for id in recipes],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0007_recipe_image_storage'),
+        ('users', '0005_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ('user',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
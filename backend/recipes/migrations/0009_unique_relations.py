@@ -0,0 +1,77 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:16
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(
+            **{field: models.OuterRef('pk')}
+        ).order_by().values(field).annotate(
+            count=models.Count('pk')
+        ).values('count')
+    ), 0)
+
+
+def delete_duplicates(model, *fields):
+    keep = model.objects.values(*fields).annotate(
+        keep=models.Min('id')
+    ).order_by().values_list('keep', flat=True)
+    return model.objects.exclude(id__in=keep).delete()[0]
+
+
+def dedupe_relations(apps, schema_editor):
+    Favorite = apps.get_model('recipes', 'Favorite')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+    Subscription = apps.get_model('recipes', 'Subscription')
+    User = apps.get_model('users', 'User')
+
+    if delete_duplicates(Favorite, 'user', 'recipe'):
+        Recipe.objects.update(
+            favorites_count=count_subquery(Favorite, 'recipe')
+        )
+    if delete_duplicates(Subscription, 'user', 'author'):
+        User.objects.update(
+            followers_count=count_subquery(Subscription, 'author')
+        )
+    if delete_duplicates(ShoppingCart, 'user', 'recipe'):
+        totals = IngredientRecipe.objects.filter(
+            recipe__shopping_recipe__isnull=False
+        ).values_list(
+            'recipe__shopping_recipe__user', 'ingredient'
+        ).annotate(amount=models.Sum('amount')).order_by()
+        ShoppingCartIngredient.objects.all().delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            ) for user_id, ingredient_id, amount in totals.iterator()
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_feeditem'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_relations, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='favorite',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_favorite'),
+        ),
+        migrations.AddConstraint(
+            model_name='shoppingcart',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_shopping_cart'),
+        ),
+        migrations.AddConstraint(
+            model_name='subscription',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_subscription'),
+        ),
+    ]
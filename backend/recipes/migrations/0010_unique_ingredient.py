@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:41
+
+from django.db import migrations, models
+
+
+def merge_duplicate_ingredients(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    IngredientRecipe = apps.get_model('recipes', 'IngredientRecipe')
+    ShoppingCartIngredient = apps.get_model(
+        'recipes', 'ShoppingCartIngredient'
+    )
+
+    groups = Ingredient.objects.values('name', 'measurement_unit').annotate(
+        keep=models.Min('id'), count=models.Count('id')
+    ).filter(count__gt=1).order_by()
+    if not groups.exists():
+        return
+
+    for group in groups.iterator():
+        duplicates = Ingredient.objects.filter(
+            name=group['name'], measurement_unit=group['measurement_unit']
+        ).exclude(id=group['keep'])
+        IngredientRecipe.objects.filter(
+            ingredient__in=duplicates
+        ).update(ingredient_id=group['keep'])
+        duplicates.delete()
+
+    merged = IngredientRecipe.objects.values('recipe', 'ingredient').annotate(
+        keep=models.Min('id'), total=models.Sum('amount'),
+        count=models.Count('id')
+    ).filter(count__gt=1).order_by()
+    for group in merged.iterator():
+        IngredientRecipe.objects.filter(
+            pk=group['keep']
+        ).update(amount=group['total'])
+        IngredientRecipe.objects.filter(
+            recipe=group['recipe'], ingredient=group['ingredient']
+        ).exclude(pk=group['keep']).delete()
+
+    totals = IngredientRecipe.objects.filter(
+        recipe__shopping_recipe__isnull=False
+    ).values_list(
+        'recipe__shopping_recipe__user', 'ingredient'
+    ).annotate(amount=models.Sum('amount')).order_by()
+    ShoppingCartIngredient.objects.all().delete()
+    ShoppingCartIngredient.objects.bulk_create(
+        ShoppingCartIngredient(
+            user_id=user_id, ingredient_id=ingredient_id, amount=amount
+        ) for user_id, ingredient_id, amount in totals.iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_unique_relations'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_ingredients, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient'),
+        ),
+    ]
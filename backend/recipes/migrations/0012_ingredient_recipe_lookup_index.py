@@ -0,0 +1,17 @@
+# Generated by Django 3.2.16 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_author_pub_date_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ingredientrecipe',
+            index=models.Index(fields=['ingredient', 'recipe'], name='ingredient_recipe_lookup'),
+        ),
+    ]
@@ -5,6 +5,8 @@ from django.db import models
 from django.utils.safestring import mark_safe
 from users.models import User
 
+from .storage import ContentHashStorage
+
 FIRST_TEXT_SYM = 15
 
 
@@ -22,6 +24,12 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('name', 'measurement_unit'),
+                name='unique_ingredient',
+            ),
+        )
 
     def __str__(self):
         return self.name[:FIRST_TEXT_SYM]
@@ -69,6 +77,13 @@ class Recipe(models.Model):
     image = models.ImageField(
         verbose_name='Изображение',
         upload_to='recipes/images/',
+        storage=ContentHashStorage(),
+    )
+    image_variants = models.JSONField(
+        verbose_name='Варианты изображения',
+        default=dict,
+        blank=True,
+        editable=False,
     )
     text = models.TextField(
         verbose_name='Описание рецепта',
@@ -92,26 +107,37 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения',
+        auto_now=True,
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Количество в избранном',
+        default=0,
+        editable=False,
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('author', '-pub_date'), name='recipe_author_pub_date'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name[:FIRST_TEXT_SYM]
 
     def image_tag(self):
+        thumb = self.image_variants.get('thumb', {}).get('webp', self.image)
         return mark_safe(
             '<img src="%s%s" style="max-height: 100px;" />'
-            % (f'{settings.MEDIA_URL}', self.image)
+            % (f'{settings.MEDIA_URL}', thumb)
         )
 
-    def favorite_count(self):
-        return self.favorite_recipe.count()
-
     image_tag.short_description = 'Избражение'
-    favorite_count.short_description = 'Количество в избранном'
 
 
 class IngredientRecipe(models.Model):
@@ -136,6 +162,12 @@ class IngredientRecipe(models.Model):
         verbose_name = 'Ингридиент рецепта'
         verbose_name_plural = 'Ингридиены рецепта'
         ordering = ('recipe',)
+        indexes = (
+            models.Index(
+                fields=('ingredient', 'recipe'),
+                name='ingredient_recipe_lookup'
+            ),
+        )
 
     def __str__(self):
         return (f'Рецепт "{self.recipe}": {self.ingredient} - {self.amount} '
@@ -160,6 +192,12 @@ class Subscription(models.Model):
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
         ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_subscription',
+            ),
+        )
 
     def __str__(self):
         return f'{self.user} подписан на {self.author}.'
@@ -183,6 +221,12 @@ class Favorite(models.Model):
         verbose_name = 'Избранный рецепт'
         verbose_name_plural = 'Избранные рецепты'
         ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_favorite',
+            ),
+        )
 
     def __str__(self):
         return f'Пользователь: {self.user}, рецепт: {self.recipe}'
@@ -206,6 +250,73 @@ class ShoppingCart(models.Model):
         verbose_name = 'Список покупок по рецепту'
         verbose_name_plural = 'Список покупок по рецептам'
         ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_shopping_cart',
+            ),
+        )
 
     def __str__(self):
         return f'Пользователь - {self.user}, рецепт - {self.recipe}.'
+
+
+class ShoppingCartIngredient(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_ingredients',
+        verbose_name='Пользователь',
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_ingredients',
+        verbose_name='Ингредиент',
+    )
+    amount = models.PositiveIntegerField(
+        verbose_name='Количество',
+    )
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique_shopping_cart_ingredient',
+            ),
+        )
+
+    def __str__(self):
+        return f'Пользователь - {self.user}, {self.ingredient} - {self.amount}'
+
+
+class FeedItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик',
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт',
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('user',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique_feed_item',
+            ),
+        )
+
+    def __str__(self):
+        return f'Лента {self.user}: {self.recipe}'
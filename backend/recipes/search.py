@@ -0,0 +1,169 @@
+import re
+
+from django.db import connection
+from django.db.models import FloatField
+from django.db.models.expressions import RawSQL
+
+from .models import Ingredient, IngredientRecipe, Recipe
+
+SEARCH_CONFIG = 'russian'
+RECIPE_TABLE = Recipe._meta.db_table
+INGREDIENT_TABLE = Ingredient._meta.db_table
+INGREDIENT_RECIPE_TABLE = IngredientRecipe._meta.db_table
+
+
+class SearchBackend:
+    def create(self, schema_editor):
+        pass
+
+    def drop(self, schema_editor):
+        pass
+
+    def refresh(self, recipe_ids=None):
+        pass
+
+    def remove(self, recipe_ids):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(name__icontains=query)
+
+
+class PostgresSearchBackend(SearchBackend):
+    table = 'recipes_recipe_search'
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE TABLE {self.table} ('
+            f'recipe_id integer PRIMARY KEY REFERENCES {RECIPE_TABLE} (id) '
+            'ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+            'document tsvector NOT NULL)'
+        )
+        schema_editor.execute(
+            f'CREATE INDEX {self.table}_document_idx '
+            f'ON {self.table} USING gin (document)'
+        )
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def refresh(self, recipe_ids=None):
+        where, params = '', [SEARCH_CONFIG] * 3
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return
+            where = 'WHERE r.id = ANY(%s)'
+            params.append(recipe_ids)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.table} (recipe_id, document) '
+                'SELECT r.id, '
+                "setweight(to_tsvector(%s, r.name), 'A') || "
+                'setweight(to_tsvector(%s, '
+                "coalesce(string_agg(i.name, ' '), '')), 'B') || "
+                "setweight(to_tsvector(%s, r.text), 'C') "
+                f'FROM {RECIPE_TABLE} r '
+                f'LEFT JOIN {INGREDIENT_RECIPE_TABLE} ir '
+                'ON ir.recipe_id = r.id '
+                f'LEFT JOIN {INGREDIENT_TABLE} i ON i.id = ir.ingredient_id '
+                f'{where} GROUP BY r.id '
+                'ON CONFLICT (recipe_id) '
+                'DO UPDATE SET document = EXCLUDED.document',
+                params
+            )
+
+    def search(self, queryset, query):
+        tsquery = 'plainto_tsquery(%s, %s)'
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT recipe_id FROM {self.table} '
+            f'WHERE document @@ {tsquery}',
+            (SEARCH_CONFIG, query)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT ts_rank(document, {tsquery}) FROM {self.table} '
+            f'WHERE recipe_id = {RECIPE_TABLE}.id',
+            (SEARCH_CONFIG, query),
+            output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date')
+
+
+class SQLiteSearchBackend(SearchBackend):
+    table = 'recipes_recipe_fts'
+
+    def create(self, schema_editor):
+        schema_editor.execute(
+            f'CREATE VIRTUAL TABLE {self.table} '
+            "USING fts5(name, ingredients, text, tokenize='unicode61')"
+        )
+
+    def drop(self, schema_editor):
+        schema_editor.execute(f'DROP TABLE IF EXISTS {self.table}')
+
+    def refresh(self, recipe_ids=None):
+        where, params = '', []
+        if recipe_ids is not None:
+            recipe_ids = list(recipe_ids)
+            if not recipe_ids:
+                return
+            placeholders = ', '.join(['%s'] * len(recipe_ids))
+            where = f'WHERE r.id IN ({placeholders})'
+            params = recipe_ids
+
+        with connection.cursor() as cursor:
+            if recipe_ids is None:
+                cursor.execute(f'DELETE FROM {self.table}')
+            else:
+                self.remove(recipe_ids)
+            cursor.execute(
+                f'INSERT INTO {self.table} '
+                '(rowid, name, ingredients, text) '
+                'SELECT r.id, r.name, '
+                "coalesce(group_concat(i.name, ' '), ''), r.text "
+                f'FROM {RECIPE_TABLE} r '
+                f'LEFT JOIN {INGREDIENT_RECIPE_TABLE} ir '
+                'ON ir.recipe_id = r.id '
+                f'LEFT JOIN {INGREDIENT_TABLE} i ON i.id = ir.ingredient_id '
+                f'{where} GROUP BY r.id',
+                params
+            )
+
+    def remove(self, recipe_ids):
+        recipe_ids = list(recipe_ids)
+        if not recipe_ids:
+            return
+
+        placeholders = ', '.join(['%s'] * len(recipe_ids))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid IN ({placeholders})',
+                recipe_ids
+            )
+
+    def search(self, queryset, query):
+        terms = ' '.join(
+            '"{}"*'.format(term.replace('"', '""'))
+            for term in re.findall(r'\w+', query)
+        )
+        if not terms:
+            return queryset.none()
+
+        return queryset.filter(id__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            (terms,)
+        )).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({self.table}, 10.0, 5.0, 1.0) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = {RECIPE_TABLE}.id',
+            (terms,),
+            output_field=FloatField()
+        )).order_by('-search_rank', '-pub_date')
+
+
+SEARCH_BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_search_backend(vendor=None):
+    return SEARCH_BACKENDS.get(vendor or connection.vendor, SearchBackend)()
@@ -0,0 +1,126 @@
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Sum
+
+from .models import IngredientRecipe, ShoppingCart, ShoppingCartIngredient
+
+
+def table(model):
+    return connection.ops.quote_name(model._meta.db_table)
+
+
+def add_amounts(source, params):
+    totals = table(ShoppingCartIngredient)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {totals} (user_id, ingredient_id, amount) {source} '
+            'ON CONFLICT (user_id, ingredient_id) DO UPDATE '
+            f'SET amount = {totals}.amount + excluded.amount',
+            params
+        )
+
+
+def subtract_amounts(source, params):
+    totals = table(ShoppingCartIngredient)
+    delta = f'WITH delta (user_id, ingredient_id, amount) AS ({source}) '
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'{delta}UPDATE {totals} SET amount = CASE '
+            f'WHEN {totals}.amount > delta.amount '
+            f'THEN {totals}.amount - delta.amount ELSE 0 END '
+            f'FROM delta WHERE {totals}.user_id = delta.user_id '
+            f'AND {totals}.ingredient_id = delta.ingredient_id',
+            params
+        )
+        cursor.execute(
+            f'{delta}DELETE FROM {totals} WHERE amount = 0 '
+            'AND (user_id, ingredient_id) IN '
+            '(SELECT user_id, ingredient_id FROM delta)',
+            params
+        )
+
+
+def change_shopping_totals(user_id, recipe_ids, delta):
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+
+    placeholders = ', '.join(['%s'] * len(recipe_ids))
+    source = (
+        'SELECT %s, ingredient_id, SUM(amount) '
+        f'FROM {table(IngredientRecipe)} '
+        f'WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id'
+    )
+    apply = add_amounts if delta > 0 else subtract_amounts
+    apply(source, [user_id, *recipe_ids])
+
+
+def change_recipe_shopping_totals(recipe_id, changes):
+    for sign, apply in ((1, add_amounts), (-1, subtract_amounts)):
+        rows = [
+            (ingredient_id, amount * sign)
+            for ingredient_id, amount in changes.items() if amount * sign > 0
+        ]
+        if not rows:
+            continue
+        source = ' UNION ALL '.join(
+            f'SELECT user_id, %s, %s FROM {table(ShoppingCart)} '
+            'WHERE recipe_id = %s' for _ in rows
+        )
+        apply(source, [
+            value for ingredient_id, amount in rows
+            for value in (ingredient_id, amount, recipe_id)
+        ])
+
+
+def recipe_amounts(recipe_id):
+    return dict(
+        IngredientRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('ingredient').annotate(Sum('amount')).order_by()
+    )
+
+
+def amount_changes(before, after):
+    changes = {
+        ingredient_id: after.get(ingredient_id, 0) - amount
+        for ingredient_id, amount in before.items()
+    }
+    for ingredient_id, amount in after.items():
+        changes.setdefault(ingredient_id, amount)
+    return {
+        ingredient_id: amount
+        for ingredient_id, amount in changes.items() if amount
+    }
+
+
+@contextmanager
+def track_shopping_totals(recipe_ids):
+    before = {recipe_id: recipe_amounts(recipe_id) for recipe_id in recipe_ids}
+    yield
+    for recipe_id, amounts in before.items():
+        change_recipe_shopping_totals(
+            recipe_id, amount_changes(amounts, recipe_amounts(recipe_id))
+        )
+
+
+def rebuild_shopping_totals(user_ids):
+    user_ids = list(user_ids)
+
+    if not user_ids:
+        return
+
+    totals = IngredientRecipe.objects.filter(
+        recipe__shopping_recipe__user__in=user_ids
+    ).values_list(
+        'recipe__shopping_recipe__user', 'ingredient'
+    ).annotate(amount=Sum('amount')).order_by()
+
+    with transaction.atomic():
+        ShoppingCartIngredient.objects.filter(user__in=user_ids).delete()
+        ShoppingCartIngredient.objects.bulk_create(
+            ShoppingCartIngredient(
+                user_id=user_id, ingredient_id=ingredient_id, amount=amount
+            ) for user_id, ingredient_id, amount in totals
+        )
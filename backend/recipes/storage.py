@@ -0,0 +1,30 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+class ContentHashStorage(FileSystemStorage):
+    def get_hashed_name(self, name, content):
+        directory, filename = os.path.split(name)
+        extension = os.path.splitext(filename)[1].lower()
+        return os.path.join(
+            directory, f'{content_hash(content)}{extension}'
+        ).replace('\\', '/')
+
+    def _save(self, name, content):
+        name = self.get_hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
@@ -0,0 +1,20 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:{}'
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time(), None)
+        return cache.get(key)
+    return version
+
+
+def bump_version(name):
+    version = time.time()
+    cache.set(VERSION_KEY.format(name), version, None)
+    return version
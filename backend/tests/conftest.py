@@ -0,0 +1,114 @@
+import base64
+from io import BytesIO
+
+import pytest
+from PIL import Image
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import User
+
+VARIANTS = {
+    variant: {'jpeg': f'{variant}.jpg', 'webp': f'{variant}.webp'}
+    for variant in ('thumb', 'card', 'detail')
+}
+
+
+@pytest.fixture(autouse=True)
+def test_settings(settings, tmp_path, request):
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': request.node.nodeid,
+        }
+    }
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.QUERY_COUNT_HEADERS = True
+
+
+def make_user(username):
+    return User.objects.create_user(
+        email=f'{username}@example.com', username=username,
+        first_name='Имя', last_name='Фамилия', password='Pass12345!'
+    )
+
+
+def make_client(user=None):
+    client = APIClient()
+    if user is not None:
+        token = Token.objects.create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def api_client(db):
+    return make_client
+
+
+@pytest.fixture
+def user(db):
+    return make_user('user')
+
+
+@pytest.fixture
+def author(db):
+    return make_user('author')
+
+
+@pytest.fixture
+def user_client(user):
+    return make_client(user)
+
+
+@pytest.fixture
+def author_client(author):
+    return make_client(author)
+
+
+@pytest.fixture
+def anonymous_client():
+    return make_client()
+
+
+@pytest.fixture
+def tags(db):
+    return [
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast'),
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch'),
+    ]
+
+
+@pytest.fixture
+def ingredients(db):
+    return [
+        Ingredient.objects.create(name=name, measurement_unit='г')
+        for name in ('капуста', 'картофель', 'морковь', 'соль')
+    ]
+
+
+@pytest.fixture
+def image():
+    buffer = BytesIO()
+    Image.new('RGB', (4, 4), '#E26C2D').save(buffer, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        buffer.getvalue()
+    ).decode()
+
+
+@pytest.fixture
+def create_recipe(author, tags):
+    def create(name, amounts, recipe_author=None):
+        recipe = Recipe.objects.create(
+            author=recipe_author or author, name=name, text='Описание',
+            cooking_time=10, image='recipes/images/recipe.png',
+            image_variants=VARIANTS,
+        )
+        recipe.tags.set(tags)
+        IngredientRecipe.objects.bulk_create(
+            IngredientRecipe(
+                recipe=recipe, ingredient=ingredient, amount=amount
+            ) for ingredient, amount in amounts.items()
+        )
+        return recipe
+    return create
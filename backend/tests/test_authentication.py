@@ -0,0 +1,46 @@
+from api.authentication import get_token_cache_key, token_cache
+from rest_framework.authtoken.models import Token
+
+
+def test_cached_token_skips_queries(user, user_client,
+                                    django_assert_num_queries):
+    user_client.get('/api/users/me/')
+    with django_assert_num_queries(0):
+        response = user_client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.json()['email'] == user.email
+
+
+def test_cached_token_omits_secrets(user, user_client):
+    user_client.get('/api/users/me/')
+    key = Token.objects.get(user=user).key
+    _, _, user_values = token_cache.get(get_token_cache_key(key))
+    assert 'password' not in user_values
+    assert 'confirmation_code' not in user_values
+
+
+def test_token_revoked_on_delete(user, user_client,
+                                 django_capture_on_commit_callbacks):
+    user_client.get('/api/users/me/')
+    with django_capture_on_commit_callbacks(execute=True):
+        Token.objects.filter(user=user).delete()
+    assert user_client.get('/api/users/me/').status_code == 401
+
+
+def test_token_revoked_on_deactivation(user, user_client,
+                                       django_capture_on_commit_callbacks):
+    user_client.get('/api/users/me/')
+    with django_capture_on_commit_callbacks(execute=True):
+        user.is_active = False
+        user.save()
+    assert user_client.get('/api/users/me/').status_code == 401
+
+
+def test_set_password_with_cached_user(user, user_client):
+    user_client.get('/api/users/me/')
+    response = user_client.post('/api/users/set_password/', {
+        'current_password': 'Pass12345!', 'new_password': 'NewPass12345!'
+    }, format='json')
+    assert response.status_code == 204
+    user.refresh_from_db()
+    assert user.check_password('NewPass12345!')
@@ -0,0 +1,126 @@
+import pytest
+from recipes.models import Ingredient
+from recipes.versions import get_version
+from users.models import User
+
+
+@pytest.fixture
+def recipe(create_recipe, ingredients):
+    return create_recipe('Борщ', {ingredients[0]: 100})
+
+
+def test_recipe_not_modified(anonymous_client, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    response = anonymous_client.get(path)
+    assert response.status_code == 200
+    assert response['Last-Modified']
+
+    response = anonymous_client.get(
+        path, HTTP_IF_NONE_MATCH=response['ETag']
+    )
+    assert response.status_code == 304
+    assert not response.content
+
+    response = anonymous_client.get(
+        path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+    )
+    assert response.status_code == 304
+
+
+def test_recipe_etag_changes_on_update(anonymous_client, author_client,
+                                       recipe, ingredients, tags,
+                                       django_capture_on_commit_callbacks):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = anonymous_client.get(path)['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = author_client.patch(path, {
+            'ingredients': [{'id': ingredients[1].id, 'amount': 5}],
+            'tags': [tags[0].id], 'name': 'Щи', 'text': 'Описание',
+            'cooking_time': 10,
+        }, format='json')
+    assert response.status_code == 200
+
+    response = anonymous_client.get(path, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response['ETag'] != etag
+    assert response.json()['name'] == 'Щи'
+
+
+def test_recipe_etag_changes_on_tag_rename(anonymous_client, recipe, tags,
+                                           django_capture_on_commit_callbacks):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = anonymous_client.get(path)['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tags[0].name = 'Ужин'
+        tags[0].save()
+
+    response = anonymous_client.get(path, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert 'Ужин' in {tag['name'] for tag in response.json()['tags']}
+
+
+def test_recipe_etag_depends_on_user_flags(user_client, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    etag = user_client.get(path)['ETag']
+
+    user_client.post(f'{path}favorite/')
+    response = user_client.get(path, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['is_favorited'] is True
+
+
+def test_recipe_etag_is_private(user_client, anonymous_client, recipe):
+    path = f'/api/recipes/{recipe.id}/'
+    response = user_client.get(path)
+    assert 'Authorization' in response['Vary']
+    assert not response.has_header('Last-Modified')
+    assert anonymous_client.get(
+        path, HTTP_IF_NONE_MATCH=response['ETag']
+    ).status_code == 200
+
+
+@pytest.mark.parametrize('path', ('/api/tags/', '/api/ingredients/'))
+def test_reference_list_not_modified(anonymous_client, tags, ingredients,
+                                     path):
+    etag = anonymous_client.get(path)['ETag']
+    assert anonymous_client.get(
+        path, HTTP_IF_NONE_MATCH=etag
+    ).status_code == 304
+
+
+def test_ingredient_list_etag_changes(anonymous_client, ingredients,
+                                      django_capture_on_commit_callbacks):
+    etag = anonymous_client.get('/api/ingredients/')['ETag']
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='лук', measurement_unit='г')
+
+    response = anonymous_client.get(
+        '/api/ingredients/', HTTP_IF_NONE_MATCH=etag
+    )
+    assert response.status_code == 200
+    assert 'лук' in {item['name'] for item in response.json()}
+
+
+@pytest.mark.parametrize('update_fields, bumped', (
+    (None, True), (['first_name'], True), (['email', 'bio'], True),
+    (['password'], False), (['is_active'], False), (['last_login'], False),
+))
+def test_user_save_bumps_recipes_for_author_fields(
+    user, django_capture_on_commit_callbacks, update_fields, bumped
+):
+    version = get_version('recipes')
+    with django_capture_on_commit_callbacks(execute=True):
+        user.save(update_fields=update_fields)
+    assert (get_version('recipes') != version) is bumped
+
+
+def test_signup_keeps_recipes_version(db, django_capture_on_commit_callbacks):
+    version = get_version('recipes')
+    with django_capture_on_commit_callbacks(execute=True):
+        User.objects.create_user(
+            email='new@example.com', username='new', password='Pass12345!'
+        )
+    assert get_version('recipes') == version
@@ -0,0 +1,115 @@
+import json
+import logging
+from io import StringIO
+
+import pytest
+from api.middleware import QueryBudgetExceededError
+from api.views import RecipeViewSet
+from django.core.management import call_command
+from django.db.models import Count
+from recipes.models import Ingredient
+from users.models import User
+
+LIMITS = (1, 6, 50)
+
+
+@pytest.fixture
+def seeded(db):
+    call_command(
+        'seed_data', users=30, recipes=600, ingredients=60, seed=42,
+        stdout=StringIO()
+    )
+
+
+def assert_within_budget(response, action, limit):
+    budget = RecipeViewSet.query_budgets[action]
+    assert response.status_code == 200, response.content
+    assert len(response.json()['results']) == limit
+    assert int(response['X-DB-Query-Budget']) == budget
+    assert int(response['X-DB-Queries']) <= budget
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+def test_recipe_list_budget(seeded, api_client, limit):
+    user = User.objects.order_by('-recipes_count', 'id').first()
+    for client in (api_client(user), api_client()):
+        response = client.get(f'/api/recipes/?limit={limit}')
+        assert_within_budget(response, 'list', limit)
+
+
+@pytest.mark.parametrize('limit', LIMITS)
+@pytest.mark.parametrize('strategy', ('read', 'write'))
+def test_feed_budget(seeded, api_client, limit, strategy):
+    user = User.objects.annotate(
+        subscriptions=Count('subscriber')
+    ).order_by('-subscriptions', 'id').first()
+    response = api_client(user).get(
+        f'/api/recipes/feed/?limit={limit}&strategy={strategy}'
+    )
+    assert_within_budget(response, 'feed', limit)
+
+
+def test_recipe_create_budget(author_client, tags, image):
+    ingredients = [
+        Ingredient.objects.create(name=f'ингредиент {i}', measurement_unit='г')
+        for i in range(30)
+    ]
+    response = author_client.post('/api/recipes/', {
+        'name': 'Рагу',
+        'text': 'Потушить.',
+        'cooking_time': 40,
+        'image': image,
+        'tags': [tags[0].id, str(tags[0].id)],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': 10} for ingredient in ingredients
+        ],
+    }, format='json')
+    assert response.status_code == 201, response.content
+    data = response.json()
+    assert [tag['id'] for tag in data['tags']] == [tags[0].id]
+    assert len(data['ingredients']) == 30
+    assert data['is_favorited'] is False
+    assert data['is_in_shopping_cart'] is False
+    assert int(response['X-DB-Queries']) <= RecipeViewSet.query_budgets[
+        'create'
+    ]
+
+
+@pytest.fixture
+def cart(user_client, create_recipe, ingredients):
+    for name in ('Борщ', 'Щи'):
+        recipe = create_recipe(name, {ingredients[0]: 100})
+        user_client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+
+
+def test_download_budget_counts_streamed_queries(cart, user_client, caplog,
+                                                 settings):
+    settings.QUERY_BUDGET_STRICT = True
+    with caplog.at_level(logging.INFO, logger='api.queries'):
+        response = user_client.get('/api/recipes/download_shopping_cart/')
+        assert not caplog.records
+        b''.join(response.streaming_content)
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['budget'] == RecipeViewSet.query_budgets[
+        'download_shopping_cart'
+    ]
+    assert 0 < record['queries'] <= record['budget']
+
+
+def test_download_budget_exceeded_while_streaming(cart, user_client,
+                                                  settings, monkeypatch):
+    settings.QUERY_BUDGET_STRICT = True
+    monkeypatch.setitem(
+        RecipeViewSet.query_budgets, 'download_shopping_cart', 0
+    )
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    with pytest.raises(QueryBudgetExceededError):
+        b''.join(response.streaming_content)
+
+
+def test_report_skips_disabled_logging(user_client, caplog, monkeypatch):
+    monkeypatch.setattr('api.middleware.json', None)
+    with caplog.at_level(logging.WARNING, logger='api.queries'):
+        response = user_client.get('/api/recipes/')
+    assert response.status_code == 200
+    assert 'X-DB-Queries' in response
@@ -0,0 +1,139 @@
+import pytest
+from PIL import Image
+from recipes.images import generate_image_variants
+
+
+@pytest.fixture
+def recipe(create_recipe, ingredients):
+    return create_recipe('Борщ', {ingredients[0]: 100})
+
+
+@pytest.fixture
+def update_data(ingredients, tags):
+    return {
+        'ingredients': [{'id': ingredients[0].id, 'amount': 150}],
+        'tags': [tags[0].id], 'name': 'Щи', 'text': 'Описание',
+        'cooking_time': 15,
+    }
+
+
+@pytest.mark.parametrize('image', ({'image': ''}, {'image': None}, {}))
+def test_update_keeps_image_without_new_one(author_client, recipe,
+                                            update_data, image):
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', {**update_data, **image}, format='json'
+    )
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    assert recipe.name == 'Щи'
+    assert recipe.image.name == 'recipes/images/recipe.png'
+    assert recipe.image_variants
+
+
+def test_update_replaces_image(author_client, recipe, update_data, image):
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', {**update_data, 'image': image},
+        format='json'
+    )
+    assert response.status_code == 200, response.content
+    recipe.refresh_from_db()
+    assert recipe.image.name != 'recipes/images/recipe.png'
+    assert not recipe.image_variants
+
+
+def test_update_rejects_oversized_image(author_client, recipe, update_data,
+                                        image, settings):
+    settings.IMAGE_MAX_PIXELS = 10
+    response = author_client.patch(
+        f'/api/recipes/{recipe.id}/', {**update_data, 'image': image},
+        format='json'
+    )
+    assert response.status_code == 400
+    assert 'image' in response.json()
+
+
+def test_variants_skip_oversized_image(recipe, settings, tmp_path):
+    Image.new('RGB', (4, 4)).save(tmp_path / 'recipe.png')
+    recipe.image = 'recipe.png'
+    recipe.image_variants = {}
+    recipe.save()
+    settings.IMAGE_MAX_PIXELS = 10
+
+    generate_image_variants(recipe.id)
+    recipe.refresh_from_db()
+    assert recipe.image_variants == {}
+
+
+def test_variants_generated(recipe, tmp_path):
+    Image.new('RGB', (4, 4)).save(tmp_path / 'recipe.png')
+    recipe.image = 'recipe.png'
+    recipe.image_variants = {}
+    recipe.save()
+
+    generate_image_variants(recipe.id)
+    recipe.refresh_from_db()
+    assert set(recipe.image_variants) == {'thumb', 'card', 'detail'}
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/feed/?search=Борщ',
+    '/api/recipes/feed/?ingredients={id}&match=best',
+    '/api/recipes/?pagination=cursor&search=Борщ',
+    '/api/recipes/?pagination=cursor&ingredients={id}&match=best',
+))
+def test_cursor_pagination_rejects_rank_ordering(user_client, recipe,
+                                                 ingredients, url):
+    response = user_client.get(url.format(id=ingredients[0].id))
+    assert response.status_code == 400, response.content
+    assert 'ordering' in response.json()
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/?search=Борщ',
+    '/api/recipes/?ingredients={id}&match=best',
+    '/api/recipes/feed/?ingredients={id}',
+    '/api/recipes/?pagination=cursor&ingredients={id}',
+))
+def test_rank_ordering_allowed_without_cursor(user_client, recipe,
+                                              ingredients, url):
+    response = user_client.get(url.format(id=ingredients[0].id))
+    assert response.status_code == 200, response.content
+
+
+@pytest.fixture
+def pantry(create_recipe, ingredients):
+    cabbage, potato, carrot, salt = ingredients
+    create_recipe('Борщ', {cabbage: 100, potato: 50, carrot: 20})
+    create_recipe('Щи', {cabbage: 100, potato: 50})
+    create_recipe('Салат', {carrot: 30, salt: 1})
+    return {ingredient.name: ingredient.id for ingredient in ingredients}
+
+
+@pytest.mark.parametrize('query, expected', (
+    ('ingredients={капуста},{картофель}', {'Борщ', 'Щи'}),
+    ('ingredients={капуста},{соль}', set()),
+    ('ingredients={капуста},{соль}&match=any', {'Борщ', 'Щи', 'Салат'}),
+    ('exclude_ingredients={соль}', {'Борщ', 'Щи'}),
+    ('ingredients={капуста}&exclude_ingredients={морковь}&match=any',
+     {'Щи'}),
+    ('exclude_ingredients={капуста},{соль}', set()),
+))
+def test_filter_by_ingredients(anonymous_client, pantry, query, expected):
+    response = anonymous_client.get(
+        '/api/recipes/?' + query.format(**pantry)
+    )
+    assert response.status_code == 200, response.content
+    assert {
+        recipe['name'] for recipe in response.json()['results']
+    } == expected
+
+
+def test_best_match_ranks_recipes(anonymous_client, pantry):
+    response = anonymous_client.get(
+        '/api/recipes/?ingredients={капуста},{картофель},{соль}'
+        '&match=best'.format(**pantry)
+    )
+    assert response.status_code == 200, response.content
+    assert [
+        recipe['name'] for recipe in response.json()['results']
+    ] == ['Щи', 'Борщ', 'Салат']
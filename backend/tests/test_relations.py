@@ -0,0 +1,147 @@
+import pytest
+from recipes.models import Favorite, FeedItem, Recipe, ShoppingCart
+from users.models import User
+
+
+@pytest.mark.parametrize('url, model', (
+    ('favorite', Favorite), ('shopping_cart', ShoppingCart)
+))
+def test_recipe_toggle(user, user_client, create_recipe, ingredients,
+                       url, model):
+    recipe = create_recipe('Борщ', {ingredients[0]: 100})
+    path = f'/api/recipes/{recipe.id}/{url}/'
+
+    response = user_client.post(path)
+    assert response.status_code == 200
+    assert response.json()['id'] == recipe.id
+    assert model.objects.filter(user=user, recipe=recipe).exists()
+    assert user_client.post(path).status_code == 400
+
+    assert user_client.delete(path).status_code == 204
+    assert not model.objects.filter(user=user, recipe=recipe).exists()
+    assert user_client.delete(path).status_code == 400
+
+
+def test_recipe_toggle_missing_recipe(user_client):
+    assert user_client.post('/api/recipes/999/favorite/').status_code == 404
+    assert user_client.delete('/api/recipes/999/favorite/').status_code == 404
+
+
+def test_recipe_toggle_requires_auth(anonymous_client, create_recipe,
+                                     ingredients):
+    recipe = create_recipe('Борщ', {ingredients[0]: 100})
+    response = anonymous_client.post(f'/api/recipes/{recipe.id}/favorite/')
+    assert response.status_code == 401
+
+
+def test_favorite_counter(user_client, author_client, create_recipe,
+                          ingredients):
+    recipe = create_recipe('Борщ', {ingredients[0]: 100})
+    path = f'/api/recipes/{recipe.id}/favorite/'
+
+    user_client.post(path)
+    author_client.post(path)
+    user_client.post(path)
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 2
+
+    user_client.delete(path)
+    user_client.delete(path)
+    recipe.refresh_from_db()
+    assert recipe.favorites_count == 1
+
+
+def test_subscribe_toggle(user, author, user_client, create_recipe,
+                          ingredients):
+    recipe = create_recipe('Борщ', {ingredients[0]: 100})
+    path = f'/api/users/{author.id}/subscribe/'
+
+    response = user_client.post(path)
+    assert response.status_code == 201
+    assert response.json()['is_subscribed'] is True
+    assert user_client.post(path).status_code == 400
+    author.refresh_from_db()
+    assert author.followers_count == 1
+    assert FeedItem.objects.filter(user=user, recipe=recipe).exists()
+
+    assert user_client.delete(path).status_code == 204
+    assert user_client.delete(path).status_code == 400
+    author.refresh_from_db()
+    assert author.followers_count == 0
+    assert not FeedItem.objects.filter(user=user).exists()
+
+
+def test_subscribe_to_self(user, user_client):
+    response = user_client.post(f'/api/users/{user.id}/subscribe/')
+    assert response.status_code == 400
+    assert User.objects.get(id=user.id).followers_count == 0
+
+
+@pytest.mark.parametrize('url, model', (
+    ('favorite', Favorite), ('shopping_cart', ShoppingCart)
+))
+def test_bulk_toggle(user, user_client, create_recipe, ingredients,
+                     url, model):
+    first, second, third = (
+        create_recipe(f'Рецепт {num}', {ingredients[num]: 100})
+        for num in range(3)
+    )
+    user_client.post(f'/api/recipes/{first.id}/{url}/')
+    path = f'/api/recipes/{url}/bulk/'
+
+    response = user_client.post(
+        path, {'recipes': [first.id, second.id, 999, second.id]},
+        format='json'
+    )
+    assert response.status_code == 200
+    assert response.json() == {'results': [
+        {'id': first.id, 'status': 'exists'},
+        {'id': second.id, 'status': 'created'},
+        {'id': 999, 'status': 'not_found'},
+    ]}
+    assert set(model.objects.filter(user=user).values_list(
+        'recipe', flat=True
+    )) == {first.id, second.id}
+
+    response = user_client.delete(
+        path, [second.id, third.id], format='json'
+    )
+    assert response.status_code == 200
+    assert response.json() == {'results': [
+        {'id': second.id, 'status': 'deleted'},
+        {'id': third.id, 'status': 'missing'},
+    ]}
+    assert list(model.objects.filter(user=user).values_list(
+        'recipe', flat=True
+    )) == [first.id]
+
+
+def test_bulk_favorite_counters(user_client, create_recipe, ingredients):
+    recipes = [
+        create_recipe(f'Рецепт {num}', {ingredients[num]: 100})
+        for num in range(2)
+    ]
+    ids = [recipe.id for recipe in recipes]
+
+    user_client.post('/api/recipes/favorite/bulk/', ids, format='json')
+    user_client.post('/api/recipes/favorite/bulk/', ids, format='json')
+    assert list(Recipe.objects.filter(id__in=ids).values_list(
+        'favorites_count', flat=True
+    )) == [1, 1]
+
+    user_client.delete('/api/recipes/favorite/bulk/', ids, format='json')
+    user_client.delete('/api/recipes/favorite/bulk/', ids, format='json')
+    assert list(Recipe.objects.filter(id__in=ids).values_list(
+        'favorites_count', flat=True
+    )) == [0, 0]
+
+
+@pytest.mark.parametrize('data', (
+    [], {'recipes': 'x'}, [1.7], [True], ['a'], [None], list(range(1, 102)),
+))
+def test_bulk_invalid_ids(user_client, data):
+    response = user_client.post(
+        '/api/recipes/favorite/bulk/', data, format='json'
+    )
+    assert response.status_code == 400
+    assert 'recipes' in response.json()
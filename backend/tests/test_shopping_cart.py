@@ -0,0 +1,135 @@
+import pytest
+from recipes.models import (IngredientRecipe, Recipe, ShoppingCart,
+                            ShoppingCartIngredient)
+from recipes.shopping import rebuild_shopping_totals, track_shopping_totals
+
+
+def totals(user):
+    return dict(ShoppingCartIngredient.objects.filter(
+        user=user
+    ).values_list('ingredient__name', 'amount'))
+
+
+@pytest.fixture
+def recipes(create_recipe, ingredients):
+    cabbage, potato, carrot, _ = ingredients
+    return (
+        create_recipe('Борщ', {cabbage: 300, potato: 200}),
+        create_recipe('Щи', {cabbage: 100, carrot: 50}),
+    )
+
+
+def test_cart_toggles_update_totals(user, user_client, recipes):
+    borscht, shchi = recipes
+
+    user_client.post(f'/api/recipes/{borscht.id}/shopping_cart/')
+    assert totals(user) == {'капуста': 300, 'картофель': 200}
+
+    user_client.post(f'/api/recipes/{shchi.id}/shopping_cart/')
+    assert totals(user) == {'капуста': 400, 'картофель': 200, 'морковь': 50}
+
+    user_client.delete(f'/api/recipes/{borscht.id}/shopping_cart/')
+    assert totals(user) == {'капуста': 100, 'морковь': 50}
+
+    user_client.delete(f'/api/recipes/{shchi.id}/shopping_cart/')
+    assert totals(user) == {}
+
+
+def test_bulk_cart_updates_totals(user, user_client, recipes):
+    ids = [recipe.id for recipe in recipes]
+
+    user_client.post('/api/recipes/shopping_cart/bulk/', ids, format='json')
+    user_client.post('/api/recipes/shopping_cart/bulk/', ids, format='json')
+    assert totals(user) == {'капуста': 400, 'картофель': 200, 'морковь': 50}
+
+    user_client.delete(
+        '/api/recipes/shopping_cart/bulk/', ids[:1], format='json'
+    )
+    assert totals(user) == {'капуста': 100, 'морковь': 50}
+
+
+def test_recipe_update_applies_ingredient_diff(user, author, user_client,
+                                               author_client, recipes,
+                                               ingredients, tags):
+    borscht, shchi = recipes
+    cabbage, potato, _, salt = ingredients
+    for client in (user_client, author_client):
+        client.post('/api/recipes/shopping_cart/bulk/', [
+            borscht.id, shchi.id
+        ], format='json')
+
+    response = author_client.patch(f'/api/recipes/{borscht.id}/', {
+        'ingredients': [
+            {'id': cabbage.id, 'amount': 250}, {'id': salt.id, 'amount': 5}
+        ],
+        'tags': [tags[0].id], 'name': 'Борщ', 'text': 'Описание',
+        'cooking_time': 10,
+    }, format='json')
+    assert response.status_code == 200
+
+    expected = {'капуста': 350, 'морковь': 50, 'соль': 5}
+    assert totals(user) == expected
+    assert totals(author) == expected
+
+
+def test_recipe_delete_removes_totals(user, user_client, author_client,
+                                      recipes):
+    borscht, shchi = recipes
+    user_client.post('/api/recipes/shopping_cart/bulk/', [
+        borscht.id, shchi.id
+    ], format='json')
+
+    response = author_client.delete(f'/api/recipes/{borscht.id}/')
+    assert response.status_code == 204
+    assert totals(user) == {'капуста': 100, 'морковь': 50}
+
+
+def test_cart_rows_deleted_directly(user, user_client, recipes):
+    user_client.post('/api/recipes/shopping_cart/bulk/', [
+        recipe.id for recipe in recipes
+    ], format='json')
+
+    ShoppingCart.objects.filter(user=user, recipe=recipes[0]).delete()
+    assert totals(user) == {'капуста': 100, 'морковь': 50}
+
+
+def test_tracked_ingredient_changes(user, user_client, recipes, ingredients):
+    borscht, _ = recipes
+    user_client.post(f'/api/recipes/{borscht.id}/shopping_cart/')
+
+    with track_shopping_totals([borscht.id]):
+        IngredientRecipe.objects.filter(
+            recipe=borscht, ingredient=ingredients[1]
+        ).delete()
+        IngredientRecipe.objects.filter(
+            recipe=borscht, ingredient=ingredients[0]
+        ).update(amount=50)
+    assert totals(user) == {'капуста': 50}
+
+
+def test_shopping_cart_summary_and_download(user_client, recipes):
+    user_client.post('/api/recipes/shopping_cart/bulk/', [
+        recipe.id for recipe in recipes
+    ], format='json')
+
+    response = user_client.get('/api/recipes/shopping_cart_summary/')
+    assert response.status_code == 200
+    assert [
+        (item['name'], item['amount']) for item in response.json()
+    ] == [('капуста', 400), ('картофель', 200), ('морковь', 50)]
+
+    response = user_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
+    content = b''.join(response.streaming_content).decode()
+    assert 'капуста' in content and '400' in content
+
+
+def test_totals_match_recount(user, user_client, recipes):
+    user_client.post('/api/recipes/shopping_cart/bulk/', [
+        recipe.id for recipe in recipes
+    ], format='json')
+    Recipe.objects.filter(id=recipes[1].id).delete()
+
+    expected = totals(user)
+    rebuild_shopping_totals([user.id])
+    assert totals(user) == expected
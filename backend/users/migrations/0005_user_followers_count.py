@@ -0,0 +1,18 @@
+# Generated by Django 3.2.16 on 2026-10-18 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество подписчиков'),
+        ),
+    ]
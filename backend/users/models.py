@@ -27,6 +27,14 @@ class User(AbstractUser):
         max_length=255, blank=True, null=True,
         verbose_name='Код подтверждения',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Количество рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0, editable=False,
+        verbose_name='Количество подписчиков',
+    )
 
     @property
     def is_admin(self):